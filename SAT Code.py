@@ -1,18 +1,84 @@
 #Importing neccesary Libraries 
 import tkinter as tk
-import requests
 import datetime
-import threading
+import time
+import argparse
 from tkinter import messagebox
-import re
-#Importing the inbuilt xml library to access the api data
-import xml.etree.ElementTree as ET
+#The EPG engine fetches, parses and queries the feed; this file only draws it
+from epg_engine import (epg_repository, bookmark_store, perf_metrics, ChannelOrder, EPGRefreshWorker,
+                        format_local_time, parse_time_cursor)
 
 '''
 This code is a Python application that provides a graphical user interface (GUI) for viewing TV channels and their programs using the XMLTV format.
 It includes features like searching for programs, filtering by genre, bookmarking channels, and displaying a timeline of current programs. 
 The GUI is built using the Tkinter library.
 '''
+class ProgramGridPool:
+    '''
+    This class holds the buttons of the channel/program grid on the main screen.
+    Every channel and program cell is created once and reused: a render only changes the text
+    and colours of a cell with config(), and cells that are not needed (short rows or the last
+    page) are hidden with place_forget() instead of being destroyed.
+    Column 0 of each row is the channel button, columns 1.. are the program buttons.
+    Each visible cell is bound to what it shows (a channel id or a program record) and on_click
+    is called with (column, that handle) when the cell is pressed.
+    '''
+    def __init__(self, root, rows, columns, y_offset=200, row_height=55, x_channel=40, x_program=260, x_spacing=200):
+        self.rows = rows
+        self.columns = columns
+        self.cells = []
+        self.positions = {}
+        self.state = {}  # (row, col) -> last (text, bg, fg) applied
+        self.handles = {}  # (row, col) -> channel id or program record shown in the cell
+        self.visible = set()
+        self.on_click = None
+        for row in range(rows):
+            y = y_offset + row * row_height
+            cells = [tk.Button(root, width=30, height=3, command=lambda r=row: self._click(r, 0))]
+            self.positions[(row, 0)] = (x_channel, y)
+            for col in range(1, columns + 1):
+                cells.append(tk.Button(root, width=38, height=3, wraplength=300, anchor="w", justify="left",
+                                       command=lambda r=row, c=col: self._click(r, c)))
+                self.positions[(row, col)] = (x_program + (col - 1) * x_spacing, y)
+            self.cells.append(cells)
+
+    def _click(self, row, col):
+        handle = self.handles.get((row, col))
+        if self.on_click and handle is not None:
+            self.on_click(col, handle)
+
+    def show(self, row, col, text, bg=None, fg=None, handle=None):
+        """
+        Update a cell in place (only if something changed), bind it to handle and make sure it
+        is visible.
+        """
+        btn = self.cells[row][col]
+        self.handles[(row, col)] = handle
+        state = (text, bg, fg)
+        if self.state.get((row, col)) != state:
+            options = {'text': text}
+            if bg is not None:
+                options['bg'] = bg
+            if fg is not None:
+                options['fg'] = fg
+            btn.config(**options)
+            self.state[(row, col)] = state
+        if (row, col) not in self.visible:
+            x, y = self.positions[(row, col)]
+            btn.place(x=x, y=y)
+            self.visible.add((row, col))
+        return btn
+
+    def hide(self, row, col):
+        if (row, col) in self.visible:
+            self.cells[row][col].place_forget()
+            self.visible.discard((row, col))
+        self.handles.pop((row, col), None)
+
+    def hide_row(self, row):
+        for col in range(self.columns + 1):
+            self.hide(row, col)
+
 class Mainscreen:
     '''
     This class represents the main screen of the application.
@@ -34,7 +100,6 @@ class Mainscreen:
         self.root.title(self.title)
         self.root.configure(bg="#001f4d")
         self.root.geometry("1320x800")  # Enlarged window size
-        self.program_buttons = []  # Initialize program_buttons to avoid attribute errors
 
     def display(self):
         label_title = tk.Label(self.root, text=self.title, bg="#001f4d", fg="white", font=("Arial", 18, "bold"))
@@ -59,161 +124,57 @@ class Mainscreen:
         # Call the methods to display channels and programs
         self.display_channels_and_programs()
         self.timebox()  # Call the timeline method to display the timeline
+        # F12 shows or hides the performance overlay
+        self.root.bind("<F12>", lambda e: self.toggle_perf_overlay())
+        # Buttons in the top right corner that open the other screens
+        add_search_button_to_main(self)
+        add_genre_filter_button_to_main(self)
+        add_bookmark_button_to_main(self)
 
     def display_channels_and_programs(self):
         """
         Fetch and display channels from the XML EPG in alphabetical order.
         For each channel, display the channel name and up to 6 programs (current and next 5) side by side.
-        This method live updates every minute to reflect the current time (local time).
+        The grid updates itself exactly when a visible program starts or ends (local time),
+        instead of on a fixed timer.
+        The feed itself is fetched and parsed by an EPGRefreshWorker thread, so the Tk thread
+        only renders.
         Also, highlights the show(s) currently being aired on each channel.
-        Supports navigation via left/right buttons.
+        Supports navigation via left/right buttons, and a time cursor to show another time
+        or a time range instead of now.
         """
         self.channel_page = 0  # Track current page for navigation
         self.channels_per_page = 15
+        self.time_cursor = None  # (start, stop or None) in epoch seconds, None while showing now
 
-        def parse_epg_and_update():
-            url = "https://xmltv.net/xml_files/Melbourne.xml"
-            try:
-                headers = {'User-Agent': 'Mozilla/5.0'}
-                response = requests.get(url, headers=headers, timeout=10)
-                response.raise_for_status()
-                xml_data = response.content
-                root = ET.fromstring(xml_data)
-                # Build a mapping from channel_id to display_name
-                channel_map = {}
-                for channel in root.findall('./channel'):
-                    channel_id = channel.get('id')
-                    display_name = channel.findtext('display-name')
-                    if channel_id and display_name:
-                        channel_map[channel_id] = display_name
-
-                # Collect programs grouped by channel
-                programs_by_channel = {}
-                for programme in root.findall('./programme'):
-                    channel_id = programme.get('channel')
-                    title = programme.findtext('title')
-                    start = programme.get('start')
-                    stop = programme.get('stop')
-                    if channel_id and title and start and stop:
-                        if channel_id not in programs_by_channel:
-                            programs_by_channel[channel_id] = []
-                        programs_by_channel[channel_id].append({
-                            'title': title,
-                            'start': start,
-                            'stop': stop
-                        })
-
-                # Sort programs by start time for each channel
-                for plist in programs_by_channel.values():
-                    plist.sort(key=lambda p: p['start'])
-
-                # Sort channels for consistent display
-                sorted_channels = sorted(channel_map.items(), key=lambda x: x[1])
-            except Exception as e:
-                print(f"Error fetching or parsing XML: {e}")
-                sorted_channels = []
-                programs_by_channel = {}
-
-            self.sorted_channels = sorted_channels
-            self.programs_by_channel = programs_by_channel
+        def apply_snapshot():
+            # Only the background worker goes back to the network; the Tk thread just
+            # takes the finished data from the shared repository and renders it.
+            self._set_channels(epg_repository.sorted_channels)
             self.update_channel_program_display()
-#           # Update the channel program display with the fetched data
-        def update_loop():
-            parse_epg_and_update()
-            self.root.after(60000, update_loop)
+
+        def poll_refresh_worker():
+            if self.refresh_worker.poll():
+                apply_snapshot()
+            self.root.after(250, poll_refresh_worker)
 
         self.update_channel_program_display = lambda: self._update_channel_program_display()
-        self._update_channel_program_display = lambda: None  # Placeholder, will be replaced below
-#        # Define the method to update the channel and program display
-        def _update_channel_program_display():
-            # Remove previous widgets if any
-            if hasattr(self, 'channel_prog_widgets'):
-                for widgets in self.channel_prog_widgets:
-                    for w in widgets:
-                        w.destroy()
-            self.channel_prog_widgets = []
-
-            sorted_channels = getattr(self, 'sorted_channels', [])
-            programs_by_channel = getattr(self, 'programs_by_channel', {})
-            y_offset = 200
-            x_channel = 40  # Channel buttons
-            x_program = x_channel + 220  # Move programs further right
-            max_channels = self.channels_per_page
-            program_box_width = 38
-            program_box_height = 3
-            program_box_x_spacing = 200  # More space between boxes
-
-            # Get current UTC time for XMLTV comparison
-            now_utc = datetime.datetime.utcnow()
-
-            start_idx = self.channel_page * max_channels
-            end_idx = start_idx + max_channels
-            for idx, (channel_id, display_name) in enumerate(sorted_channels[start_idx:end_idx]):
-                widgets = []
-                # Channel button
-                btn_channel = tk.Button(self.root, text=display_name, width=30, height=program_box_height)
-                btn_channel.place(x=x_channel, y=y_offset)
-                widgets.append(btn_channel)
-                # Find up to 6 programs: current and next 5
-                programs = programs_by_channel.get(channel_id, [])
-                prog_indices = []
-                found_current = False
-                for i, prog in enumerate(programs):
-                    try:
-                        start_dt = datetime.datetime.strptime(prog['start'][:14], "%Y%m%d%H%M%S")
-                        stop_dt = datetime.datetime.strptime(prog['stop'][:14], "%Y%m%d%H%M%S")
-                    except Exception:
-                        continue
-                    # Use CURRENT TIME (now_utc) to find currently airing program
-                    if start_dt <= now_utc < stop_dt:
-                        prog_indices = list(range(i, min(i + 6, len(programs))))
-                        found_current = True
-                        break
-                    elif now_utc < start_dt and not found_current:
-                        prog_indices = list(range(i, min(i + 6, len(programs))))
-                        break
-                if not prog_indices and programs:
-                    prog_indices = list(range(min(6, len(programs))))
-                # Display up to 6 program buttons
-                for j, prog_idx in enumerate(prog_indices):
-                    prog = programs[prog_idx]
-                    try:
-                        start_dt = datetime.datetime.strptime(prog['start'][:14], "%Y%m%d%H%M%S")
-                        stop_dt = datetime.datetime.strptime(prog['stop'][:14], "%Y%m%d%H%M%S")
-                        # Convert UTC to local time for display
-                        start_str = start_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%H:%M")
-                        stop_str = stop_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%H:%M")
-                    except Exception as e:
-                        start_str = stop_str = ""
-                        start_dt = stop_dt = None
-                    # Highlight the program that is currently airing
-                    if start_dt and stop_dt and start_dt <= now_utc < stop_dt:
-                        prog_text = f"Now: {prog['title']} ({start_str}-{stop_str})"
-                        bg_color = "#e0ffe0"
-                    else:
-                        prog_text = f"{prog['title']} ({start_str}-{stop_str})"
-                        bg_color = "#ffffe0"
-                    btn_prog = tk.Button(
-                        self.root,
-                        text=prog_text,
-                        width=program_box_width,
-                        height=program_box_height,
-                        bg=bg_color,
-                        wraplength=300,
-                        anchor="w",
-                        justify="left"
-                    )
-                    btn_prog.place(x=x_program + j * program_box_x_spacing, y=y_offset)
-                    widgets.append(btn_prog)
-                self.channel_prog_widgets.append(widgets)
-                y_offset += 55
-
-        self._update_channel_program_display = _update_channel_program_display
 
         # Add navigation buttons
         self.navigationf_of_channels_and_program()
-
-        update_loop()
+        self.time_cursor_controls()
+
+        # Render whatever is already loaded (or was saved by the last run), then let the
+        # worker revalidate the feed in the background
+        epg_repository.load_saved()
+        self._set_channels(epg_repository.sorted_channels)
+        self.update_channel_program_display()
+        if not hasattr(self, 'refresh_worker'):
+            self.refresh_worker = EPGRefreshWorker(epg_repository)
+            self.refresh_worker.start()
+            poll_refresh_worker()
+        else:
+            self.refresh_worker.request_refresh()
 #Creates buttons named next and previous which enable the user to navigate through the channels and programs.
 #To the next set of channels and programs or the previous set of channels and programs.\
 #Previously it was thought that the 6  day schedule could be implemented but it was not possible to do so.
@@ -243,12 +204,232 @@ class Mainscreen:
 
         self.nav_right_btn = tk.Button(self.root, text="Next >>", command=go_right, font=("Arial", 12))
         self.nav_right_btn.place(x=220, y=160)
+
+    def time_cursor_controls(self):
+        """
+        Create the time cursor: an entry to jump to a time or a time range (see
+        parse_time_cursor), buttons to move it by an hour and a Now button to go back to live.
+        """
+        tk.Label(self.root, text="Time:", bg="#001f4d", fg="white", font=("Arial", 12)).place(x=420, y=162)
+        self.time_entry = tk.Entry(self.root, font=("Arial", 12), width=18)
+        self.time_entry.place(x=475, y=163)
+        self.time_entry.bind("<Return>", lambda e: self._jump_from_entry())
+        tk.Button(self.root, text="Go", command=self._jump_from_entry, font=("Arial", 11)).place(x=650, y=158)
+        tk.Button(self.root, text="- 1h", command=lambda: self.step_time_cursor(-1), font=("Arial", 11)).place(x=700, y=158)
+        tk.Button(self.root, text="Now", command=lambda: self.set_time_cursor(None), font=("Arial", 11)).place(x=755, y=158)
+        tk.Button(self.root, text="+ 1h", command=lambda: self.step_time_cursor(1), font=("Arial", 11)).place(x=810, y=158)
+        self.time_cursor_label = tk.Label(self.root, text="Showing: now", bg="#001f4d", fg="white", font=("Arial", 12, "italic"))
+        self.time_cursor_label.place(x=870, y=162)
+
+    def _jump_from_entry(self):
+        try:
+            start, stop = parse_time_cursor(self.time_entry.get())
+        except ValueError as e:
+            messagebox.showerror("Time", str(e))
+            return
+        self.set_time_cursor(start, stop)
+
+    def step_time_cursor(self, hours):
+        """Move the time cursor (or range) by a number of hours, starting from now if it is live."""
+        start, stop = self.time_cursor or (int(time.time()), None)
+        shift = hours * 3600
+        self.set_time_cursor(start + shift, stop + shift if stop is not None else None)
+
+    def set_time_cursor(self, start, stop=None):
+        """
+        Show the grid at epoch time start (or for the range start to stop) instead of now;
+        start None goes back to live. The time is kept inside the range the feed covers.
+        """
+        if start is None:
+            self.time_cursor = None
+            self.time_cursor_label.config(text="Showing: now")
+        else:
+            time_range = epg_repository.time_range()
+            if time_range:
+                shift = max(time_range[0], min(start, time_range[1] - 1)) - start
+                start += shift
+                stop = stop + shift if stop is not None else None
+            self.time_cursor = (start, stop)
+            text = format_local_time(start, "%a %d %b %H:%M")
+            if stop is not None:
+                text += format_local_time(stop, "-%H:%M")
+            self.time_cursor_label.config(text=f"Showing: {text}")
+        self.update_channel_program_display()
+    def _set_channels(self, channels):
+        """Use a new channel list (sorted by name), shown in the order kept by a ChannelOrder."""
+        self.sorted_channels = list(channels)
+        self.channel_order = ChannelOrder(self.sorted_channels, bookmark_store.names)
+
+    def _grid_rows(self):
+        """
+        Channels on the current page as (channel_id, button text, text colour) tuples.
+        Bookmarked channels always come first and get a yellow star.
+        """
+        order = self.channel_order
+        start_idx = self.channel_page * self.channels_per_page
+        rows = []
+        for row in range(start_idx, min(start_idx + self.channels_per_page, len(order))):
+            channel_id, display_name, is_bookmarked = order.at_row(row)
+            if is_bookmarked:
+                rows.append((channel_id, "★ " + display_name, "#FFD700"))
+            else:
+                rows.append((channel_id, display_name, "black"))
+        return rows
+
+    def bookmark_changed(self, display_name, bookmarked):
+        """Called when a channel is bookmarked or un-bookmarked: re-render only the rows that moved."""
+        changed = self.channel_order.set_bookmarked(display_name, bookmarked)
+        if changed is None:
+            return
+        first = self.channel_page * self.channels_per_page
+        rows = [row - first for row in changed if first <= row < first + self.channels_per_page]
+        if rows:
+            self._update_channel_program_display(rows)
+
+    def _update_channel_program_display(self, only_rows=None):
+        """
+        Render the current page of channels and their current and next 5 programs, or the ones
+        at the time cursor: on at and after a single time, or on during a time range.
+        The buttons come from a ProgramGridPool that is created on the first render, so this
+        only changes text and colours of existing cells. only_rows limits the render to those
+        grid rows, e.g. the ones a bookmark toggle moved.
+        The time taken and the number of widgets created and destroyed are recorded in perf_metrics.
+        """
+        render_start = time.perf_counter()
+        widgets_before = set(self.root.winfo_children())
+        if not hasattr(self, 'grid_pool'):
+            self.grid_pool = ProgramGridPool(self.root, self.channels_per_page, 6)
+            self.grid_pool.on_click = self._on_grid_click
+        pool = self.grid_pool
+
+        # Current time as epoch seconds, compared with the start_ts/stop_ts stored at ingest
+        now_ts = int(time.time())
+        cursor_start, cursor_stop = getattr(self, 'time_cursor', None) or (now_ts, None)
+
+        rows = self._grid_rows()
+        if only_rows is None or not hasattr(self, 'row_boundaries'):
+            only_rows = range(pool.rows)
+            self.row_boundaries = [[] for _ in range(pool.rows)]
+        for row in only_rows:
+            boundaries = self.row_boundaries[row] = []
+            if row >= len(rows):
+                pool.hide_row(row)
+                continue
+            channel_id, channel_text, channel_fg = rows[row]
+            pool.show(row, 0, channel_text, fg=channel_fg, handle=channel_id)
+            if cursor_stop is None:
+                # Find up to 6 programs: current and next 5 (binary search on the start times)
+                programs = epg_repository.now_and_next(channel_id, cursor_start, pool.columns)
+            else:
+                programs = epg_repository.programmes_between(channel_id, cursor_start, cursor_stop)[:pool.columns]
+            for j in range(pool.columns):
+                if j >= len(programs):
+                    pool.hide(row, j + 1)
+                    continue
+                prog = programs[j]
+                # Convert to local time for display
+                start_str = format_local_time(prog.start_ts)
+                stop_str = format_local_time(prog.stop_ts)
+                # Highlight the program that is currently airing (or airing at the time cursor)
+                if prog.start_ts <= now_ts < prog.stop_ts:
+                    prog_text = f"Now: {prog.title} ({start_str}-{stop_str})"
+                    bg_color = "#e0ffe0"
+                elif prog.start_ts <= cursor_start < prog.stop_ts:
+                    prog_text = f"{prog.title} ({start_str}-{stop_str})"
+                    bg_color = "#e0ffe0"
+                else:
+                    prog_text = f"{prog.title} ({start_str}-{stop_str})"
+                    bg_color = "#ffffe0"
+                pool.show(row, j + 1, prog_text, bg=bg_color, handle=prog)
+                # The grid next changes when a shown program starts or ends airing
+                if prog.start_ts > now_ts:
+                    boundaries.append(prog.start_ts)
+                elif prog.stop_ts > now_ts:
+                    boundaries.append(prog.stop_ts)
+        self._schedule_next_boundary([ts for row_boundaries in self.row_boundaries for ts in row_boundaries])
+        widgets_after = set(self.root.winfo_children())
+        perf_metrics.record("render", time.perf_counter() - render_start, {
+            "rows": len(only_rows),
+            "widgets_created": len(widgets_after - widgets_before),
+            "widgets_destroyed": len(widgets_before - widgets_after)
+        })
+
+    def _on_grid_click(self, col, handle):
+        """
+        Show the description of a clicked grid cell. The cell is bound to its channel id or
+        program record when it is rendered, so this is a direct lookup.
+        """
+        if col == 0:
+            if not hasattr(self, 'channel_description_window'):
+                self.channel_description_window = ChannelDescription()
+            self.channel_description_window.fetch_channel_descriptions()
+            self.channel_description_window.show_channel_description(epg_repository.channel_name(handle))
+        else:
+            if not hasattr(self, 'description_window'):
+                self.description_window = Description()
+            self.description_window.show_description(handle)
+
+    def _schedule_next_boundary(self, boundaries):
+        """
+        Schedule the next grid update for the earliest program start/stop among the visible rows.
+        Between those moments nothing on the grid can change, so no timer runs at all.
+        """
+        if getattr(self, '_boundary_after', None):
+            self.root.after_cancel(self._boundary_after)
+            self._boundary_after = None
+        if not boundaries:
+            return
+        # Re-check at least hourly in case the system clock is changed
+        delay = min(min(boundaries) - time.time(), 3600)
+        self._boundary_after = self.root.after(max(0, int(delay * 1000)) + 50, self._on_program_boundary)
+
+    def _on_program_boundary(self):
+        self._boundary_after = None
+        # Cells whose text and colour did not change are skipped by the grid pool
+        self.update_channel_program_display()
+
 #A timeline is created to show the current time in the top left corner of the main screen.
     def timebox(self):
-        """Create a timebox for displaying time. This does NOT live update."""
+        """
+        Create a timebox for displaying time. The clock ticks on its own at the start of every
+        second and only changes this label, never the channel grid.
+        """
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.timebox = tk.Label(self.root, text=now, bg="#ffffff", fg="black", font=("Arial", 12))
         self.timebox.place(x=0, y=0)
+        label = self.timebox
+
+        def tick():
+            label.config(text=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            label.after(1000 - int(time.time() * 1000) % 1000, tick)
+        tick()
+
+    def toggle_perf_overlay(self):
+        """
+        Show or hide the performance overlay in the bottom right corner: the last and 95th
+        percentile time of each operation in perf_metrics and the counters recorded with it.
+        It updates itself every second while it is shown.
+        """
+        if getattr(self, 'perf_overlay', None) is None:
+            self.perf_overlay = tk.Label(self.root, bg="black", fg="#00ff00", font=("Courier", 10),
+                                         justify="left", anchor="w")
+        if getattr(self, '_perf_overlay_after', None):
+            self.root.after_cancel(self._perf_overlay_after)
+            self._perf_overlay_after = None
+            self.perf_overlay.place_forget()
+            return
+        self.perf_overlay.place(relx=1.0, rely=1.0, x=-10, y=-10, anchor="se")
+        self._refresh_perf_overlay()
+
+    def _refresh_perf_overlay(self):
+        lines = []
+        for name, last, p95, count, counters in perf_metrics.summary():
+            line = f"{name:<12} last {last * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms  n={count}"
+            extra = " ".join(f"{key}={value}" for key, value in counters.items() if isinstance(value, (int, float)))
+            lines.append(f"{line}  {extra}" if extra else line)
+        self.perf_overlay.config(text="\n".join(lines) or "No timings yet")
+        self.perf_overlay.lift()
+        self._perf_overlay_after = self.root.after(1000, self._refresh_perf_overlay)
 
     def run(self):
         self.display()
@@ -257,11 +438,141 @@ class Mainscreen:
     def refresh_channel_list(self):
         """
         Refresh the main channel list and program display immediately.
+        The fetch runs on the background worker; the grid updates when it finishes.
         """
-        if hasattr(self, 'display_channels_and_programs'):
-            self.display_channels_and_programs()
+        if hasattr(self, 'refresh_worker'):
+            self.refresh_worker.request_refresh()
+            self.update_channel_program_display()
 
             
+def when_guide_ready(widget, callback, on_wait):
+    """
+    Call callback once the guide data is loaded, without ever fetching on the Tk thread.
+    If it is not loaded yet, on_wait(text, colour) is called with a loading (or fetch error)
+    message and the check is repeated every 250 ms until the background worker has installed
+    the data, or widget has been closed.
+    """
+    if epg_repository.available():
+        callback()
+        return
+    if epg_repository.error:
+        on_wait(f"Could not fetch EPG data yet: {epg_repository.error}. Retrying...", "red")
+    else:
+        on_wait("Loading the guide...", "white")
+
+    def retry():
+        if widget.winfo_exists():
+            when_guide_ready(widget, callback, on_wait)
+    widget.after(250, retry)
+
+class VirtualResultList:
+    '''
+    This class is a scrolling list of result boxes that only creates widgets for the rows that
+    fit in the visible area. Scrolling moves the same row widgets and gives them the text of the
+    results now in view, so thousands of results cost the same to show as ten.
+    lines describes the labels of each box as (function returning the text for a result, colour, font).
+    on_click, if set, is called with the result that was clicked.
+    '''
+    def __init__(self, parent, lines, row_height, bg="#003366", box_bg="#224477"):
+        self.lines = lines
+        self.row_height = row_height
+        self.box_bg = box_bg
+        self.items = []
+        self.offset = 0  # Pixels scrolled from the top of the list
+        self.rows = []  # Pooled (frame, labels) for each visible row
+        self.row_items = []  # Index of the result each pooled row is showing
+        self.on_click = None
+
+        container = tk.Frame(parent, bg=bg)
+        container.pack(fill="both", expand=True, padx=10, pady=10)
+        self.viewport = tk.Frame(container, bg=bg)
+        self.scrollbar = tk.Scrollbar(container, orient="vertical", command=self.yview)
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.message = tk.Label(self.viewport, bg=bg, fg="white", font=("Arial", 12), anchor="w")
+        self.viewport.bind("<Configure>", lambda e: self._render())
+        self._bind_wheel(self.viewport)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", self._on_wheel)
+        widget.bind("<Button-5>", self._on_wheel)
+
+    def _on_wheel(self, event):
+        up = getattr(event, 'num', None) == 4 or getattr(event, 'delta', 0) > 0
+        self.yview("scroll", -1 if up else 1, "units")
+
+    def set_items(self, items):
+        """Show a new list of results, scrolled to the top."""
+        self.items = items
+        self.offset = 0
+        self.row_items = [None] * len(self.rows)
+        self.message.place_forget()
+        self._render()
+
+    def show_message(self, text, fg="white"):
+        """Clear the list and show a single line of text instead."""
+        self.set_items([])
+        self.message.config(text=text, fg=fg)
+        self.message.place(x=10, y=5)
+
+    def yview(self, *args):
+        """Scrollbar and mouse wheel command, takes the same arguments as Canvas.yview."""
+        height = self.viewport.winfo_height()
+        total = len(self.items) * self.row_height
+        if args[0] == "moveto":
+            self.offset = float(args[1]) * total
+        elif args[0] == "scroll":
+            step = self.row_height if args[2] == "units" else max(height - self.row_height, self.row_height)
+            self.offset += int(args[1]) * step
+        self.offset = int(max(0, min(self.offset, total - height)))
+        self._render()
+
+    def _make_row(self):
+        frame = tk.Frame(self.viewport, bg=self.box_bg, bd=2, relief="groove", cursor="hand2")
+        labels = []
+        for i, (text_for, fg, font) in enumerate(self.lines):
+            pady = (4, 0) if i == 0 else (0, 4) if i == len(self.lines) - 1 else 0
+            label = tk.Label(frame, bg=self.box_bg, fg=fg, font=font, anchor="w")
+            label.pack(anchor="w", padx=8, pady=pady)
+            labels.append(label)
+        row_number = len(self.rows)
+        for widget in [frame] + labels:
+            widget.bind("<Button-1>", lambda e, n=row_number: self._click(n))
+            self._bind_wheel(widget)
+        self.rows.append((frame, labels))
+        self.row_items.append(None)
+
+    def _click(self, row_number):
+        index = self.row_items[row_number]
+        if self.on_click and index is not None and index < len(self.items):
+            self.on_click(self.items[index])
+
+    def _render(self):
+        height = max(self.viewport.winfo_height(), self.row_height)
+        # Enough rows to cover the viewport plus one partly scrolled into view
+        needed = min(height // self.row_height + 2, len(self.items))
+        while len(self.rows) < needed:
+            self._make_row()
+        first = self.offset // self.row_height
+        for i, (frame, labels) in enumerate(self.rows):
+            index = first + i
+            if index >= len(self.items):
+                frame.place_forget()
+                self.row_items[i] = None
+                continue
+            if self.row_items[i] != index:
+                item = self.items[index]
+                for label, (text_for, fg, font) in zip(labels, self.lines):
+                    label.config(text=text_for(item))
+                self.row_items[i] = index
+            frame.place(x=10, y=index * self.row_height - self.offset + 6, relwidth=1, width=-20, height=self.row_height - 12)
+        total = len(self.items) * self.row_height
+        if total > height:
+            self.scrollbar.set(self.offset / total, (self.offset + height) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
 '''
 This class represents the search functionality of the application.
 It initializes a search screen with an entry field for the search term,
@@ -284,93 +595,63 @@ class Search():
         label.pack(pady=(20, 10))
         self.entry = tk.Entry(self.root, font=("Arial", 12))
         self.entry.pack(pady=(0, 10))
+        # Search as you type, waiting for a short pause so every keystroke does not search
+        self._search_after = None
+        self.entry.bind("<KeyRelease>", self.schedule_search)
         tk.Button(self.root, text="Search", command=lambda: self.search(self.entry.get()), font=("Arial", 12)).pack(pady=(0, 20))
 
-        # --- Scrollable results frame ---
-        container = tk.Frame(self.root, bg="#003366")
-        container.pack(fill="both", expand=True, padx=10, pady=10)
-        canvas = tk.Canvas(container, bg="#003366", highlightthickness=0)
-        scrollbar = tk.Scrollbar(container, orient="vertical", command=canvas.yview)
-        self.results_frame = tk.Frame(canvas, bg="#003366")
+        # --- Scrollable results list, only the visible rows are real widgets ---
+        # Show name (title) on top, channel name below, both medium size
+        self.result_list = VirtualResultList(self.root, [
+            (lambda item: item["title"], "white", ("Arial", 14, "bold")),
+            (lambda item: item["channel"], "#ffcc00", ("Arial", 13)),
+            (lambda item: f"{item['start']} - {item['stop']}", "#cccccc", ("Arial", 11, "italic"))
+        ], row_height=92)
+        # Left-click on a result shows its description
+        self.result_list.on_click = self.show_result_description
+        # Removed self.root.mainloop() to avoid nested mainloops
 
-        self.results_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
-        canvas.create_window((0, 0), window=self.results_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+    def schedule_search(self, event=None):
+        """Debounce typing in the entry: search 200 ms after the last key press."""
+        if self._search_after:
+            self.root.after_cancel(self._search_after)
+        self._search_after = self.root.after(200, self._search_from_entry)
 
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        # Removed self.root.mainloop() to avoid nested mainloops
+    def _search_from_entry(self):
+        self._search_after = None
+        term = self.entry.get()
+        if term.strip() != self.search_term:
+            self.search(term)
 
     def search(self, term):
-        """Search EPG data from the URL for the given keyword and show results in a new menu."""
+        """
+        Search the shared EPG data for the given keyword and show results in a new menu.
+        Every word of the keyword must start a word of the program title.
+        """
         self.search_term = term.strip()
         self.results = []
-        # Clear previous results
-        for widget in self.results_frame.winfo_children():
-            widget.destroy()
         if not self.search_term:
-            tk.Label(self.results_frame, text="Please enter a search term.", bg="#003366", fg="white", font=("Arial", 12)).pack(anchor="w", pady=5, padx=10)
+            self.result_list.show_message("Please enter a search term.")
             return
+        term = self.search_term
+        when_guide_ready(self.root, lambda: self._show_results(term), self.result_list.show_message)
 
-        url = "https://xmltv.net/xml_files/Melbourne.xml"
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            xml_data = response.content
-            root = ET.fromstring(xml_data)
-        except Exception as e:
-            tk.Label(self.results_frame, text=f"Failed to fetch EPG data: {e}", bg="#003366", fg="red", font=("Arial", 12)).pack(anchor="w", pady=5, padx=10)
-            return
-
-        # Build channel id to display-name mapping
-        channel_map = {}
-        for channel in root.findall('./channel'):
-            channel_id = channel.get('id')
-            display_name = channel.findtext('display-name')
-            if channel_id and display_name:
-                channel_map[channel_id] = display_name
-
-        # Search for matching programs
-        for programme in root.findall('./programme'):
-            title = programme.findtext('title') or ""
-            if self.search_term.lower() in title.lower():
-                channel_id = programme.get('channel')
-                channel_name = channel_map.get(channel_id, channel_id)
-                start = programme.get('start')
-                stop = programme.get('stop')
-                try:
-                    start_dt = datetime.datetime.strptime(start[:14], "%Y%m%d%H%M%S")
-                    stop_dt = datetime.datetime.strptime(stop[:14], "%Y%m%d%H%M%S")
-                    # Convert UTC to local time for display
-                    start_str = start_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%Y-%m-%d %H:%M")
-                    stop_str = stop_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%H:%M")
-                except Exception:
-                    start_str = start
-                    stop_str = stop
-                self.results.append({
-                    "channel": channel_name,
-                    "title": title,
-                    "start": start_str,
-                    "stop": stop_str
-                })
+    def _show_results(self, term):
+        if term != self.search_term:
+            return  # A newer search replaced this one while the guide was loading
+        # Look up matching programs in the title index
+        self.results = epg_repository.search(term)
 
         if self.results:
-            for item in self.results:
-                # Each result in its own frame for separation
-                result_box = tk.Frame(self.results_frame, bg="#224477", bd=2, relief="groove")
-                result_box.pack(fill="x", padx=10, pady=6, anchor="w")
-                # Show name (title) on top, channel name below, both medium size
-                tk.Label(result_box, text=item["title"], bg="#224477", fg="white", font=("Arial", 14, "bold")).pack(anchor="w", padx=8, pady=(4,0))
-                tk.Label(result_box, text=item["channel"], bg="#224477", fg="#ffcc00", font=("Arial", 13)).pack(anchor="w", padx=8, pady=(0,2))
-                tk.Label(result_box, text=f"{item['start']} - {item['stop']}", bg="#224477", fg="#cccccc", font=("Arial", 11, "italic")).pack(anchor="w", padx=8, pady=(0,4))
+            self.result_list.set_items(self.results)
         else:
-            tk.Label(self.results_frame, text=f"No results found for '{self.search_term}'.", bg="#003366", fg="white", font=("Arial", 12)).pack(anchor="w", pady=5, padx=10)
+            self.result_list.show_message(f"No results found for '{self.search_term}'.")
+
+    def show_result_description(self, item):
+        """Each result carries its program record and snapshot, so this is a direct lookup even after a refresh."""
+        if not hasattr(self, 'description_window'):
+            self.description_window = Description()
+        self.description_window.show_description(item["programme"], item["snapshot"])
 
 # --- Add a search button to the top right corner of the main screen ---
 def add_search_button_to_main(main_screen):
@@ -386,12 +667,6 @@ def add_search_button_to_main(main_screen):
     search_btn = tk.Button(main_screen.root, text="Search", command=open_search, font=("Arial", 12))
     search_btn.place(relx=1.0, x=-120, y=10, anchor="ne")  # Adjust x for padding
 
-# Patch Mainscreen to add the search button after initialization
-orig_display = Mainscreen.display
-def new_display(self, *args, **kwargs):
-    orig_display(self, *args, **kwargs)
-    add_search_button_to_main(self)
-Mainscreen.display = new_display
 class GenreFilter:
     def __init__(self):
         self.selected_genres = set()
@@ -408,128 +683,79 @@ class GenreFilter:
         label.pack(pady=(20, 10))
 
         # --- Genre checkboxes ---
-        # Genres based on actual EPG data from xmltv.net/Melbourne.xml
-        # Dynamically extract 10 unique genres from the EPG XML
-        url = "https://xmltv.net/xml_files/Melbourne.xml"
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            xml_data = response.content
-            root = ET.fromstring(xml_data)
-            genre_set = set()
-            for programme in root.findall('./programme'):
-                for cat in programme.findall('category'):
-                    if cat.text:
-                        genre_set.add(cat.text.strip())
-            genres = sorted(list(genre_set))[:10]
-        except Exception as e:
-            genres = [
+        checkbox_frame = tk.Frame(self.root, bg="#003366")
+        checkbox_frame.pack(pady=(0, 10))
+        loading = tk.Label(checkbox_frame, bg="#003366", font=("Arial", 12))
+
+        def show_loading(text, fg):
+            loading.config(text=text, fg=fg)
+            loading.pack(side="left")
+
+        def show_genres():
+            # Dynamically extract 10 unique genres from the EPG data once it is loaded
+            loading.destroy()
+            genres = epg_repository.categories[:10] or [
             "News", "Sport", "Drama", "Comedy", "Documentary",
             "Movie", "Children's", "Reality", "Lifestyle", "Entertainment"
             ]
-        checkbox_frame = tk.Frame(self.root, bg="#003366")
-        checkbox_frame.pack(pady=(0, 10))
-        for genre in genres:
-            var = tk.BooleanVar()
-            cb = tk.Checkbutton(
-                checkbox_frame, text=genre, variable=var,
-                bg="#003366", fg="white", selectcolor="#224477",
-                font=("Arial", 12), anchor="w"
-            )
-            cb.pack(side="left", padx=8)
-            self.genre_vars[genre] = var
+            for genre in genres:
+                var = tk.BooleanVar()
+                cb = tk.Checkbutton(
+                    checkbox_frame, text=genre, variable=var,
+                    bg="#003366", fg="white", selectcolor="#224477",
+                    font=("Arial", 12), anchor="w"
+                )
+                cb.pack(side="left", padx=8)
+                self.genre_vars[genre] = var
+        when_guide_ready(self.root, show_genres, show_loading)
+
+        # Choose between programs in any selected genre (OR) or in all of them (AND)
+        self.match_all_var = tk.BooleanVar()
+        tk.Checkbutton(
+            self.root, text="Match all selected genres", variable=self.match_all_var,
+            bg="#003366", fg="white", selectcolor="#224477", font=("Arial", 12)
+        ).pack(pady=(0, 10))
 
         tk.Button(
             self.root, text="Apply Filter",
             command=self.apply_filter, font=("Arial", 12)
         ).pack(pady=(0, 20))
 
-        # --- Scrollable results frame ---
-        container = tk.Frame(self.root, bg="#003366")
-        container.pack(fill="both", expand=True, padx=10, pady=10)
-        canvas = tk.Canvas(container, bg="#003366", highlightthickness=0)
-        scrollbar = tk.Scrollbar(container, orient="vertical", command=canvas.yview)
-        self.results_frame = tk.Frame(canvas, bg="#003366")
-
-        self.results_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
-        canvas.create_window((0, 0), window=self.results_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        # --- Scrollable results list, only the visible rows are real widgets ---
+        # Show name (title) on top, channel name below, both medium size
+        self.result_list = VirtualResultList(self.root, [
+            (lambda item: item["title"], "white", ("Arial", 14, "bold")),
+            (lambda item: item["channel"], "#ffcc00", ("Arial", 13)),
+            (lambda item: f"Genres: {item['genres']}", "#99ffcc", ("Arial", 11)),
+            (lambda item: f"{item['start']} - {item['stop']}", "#cccccc", ("Arial", 11, "italic"))
+        ], row_height=112)
+        # Left-click on a result shows its description
+        self.result_list.on_click = self.show_result_description
 
     def apply_filter(self):
         """Filter EPG data for selected genres and show results."""
         self.selected_genres = {g for g, v in self.genre_vars.items() if v.get()}
         self.results = []
-        # Clear previous results
-        for widget in self.results_frame.winfo_children():
-            widget.destroy()
         if not self.selected_genres:
-            tk.Label(self.results_frame, text="Please select at least one genre.", bg="#003366", fg="white", font=("Arial", 12)).pack(anchor="w", pady=5, padx=10)
+            self.result_list.show_message("Please select at least one genre.")
             return
+        when_guide_ready(self.root, self._show_results, self.result_list.show_message)
 
-        url = "https://xmltv.net/xml_files/Melbourne.xml"
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            xml_data = response.content
-            root = ET.fromstring(xml_data)
-        except Exception as e:
-            tk.Label(self.results_frame, text=f"Failed to fetch EPG data: {e}", bg="#003366", fg="red", font=("Arial", 12)).pack(anchor="w", pady=5, padx=10)
-            return
-
-        # Build channel id to display-name mapping
-        channel_map = {}
-        for channel in root.findall('./channel'):
-            channel_id = channel.get('id')
-            display_name = channel.findtext('display-name')
-            if channel_id and display_name:
-                channel_map[channel_id] = display_name
-
-        # Search for matching programs by genre
-        for programme in root.findall('./programme'):
-            genres = [el.text for el in programme.findall('category') if el.text]
-            if any(g in self.selected_genres for g in genres):
-                title = programme.findtext('title') or ""
-                channel_id = programme.get('channel')
-                channel_name = channel_map.get(channel_id, channel_id)
-                start = programme.get('start')
-                stop = programme.get('stop')
-                try:
-                    start_dt = datetime.datetime.strptime(start[:14], "%Y%m%d%H%M%S")
-                    stop_dt = datetime.datetime.strptime(stop[:14], "%Y%m%d%H%M%S")
-                    start_str = start_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%Y-%m-%d %H:%M")
-                    stop_str = stop_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%H:%M")
-                except Exception:
-                    start_str = start
-                    stop_str = stop
-                self.results.append({
-                    "channel": channel_name,
-                    "title": title,
-                    "genres": ", ".join(genres),
-                    "start": start_str,
-                    "stop": stop_str
-                })
+    def _show_results(self):
+        # Combine the genre posting lists: any selected genre, or all of them
+        match_all = self.match_all_var.get() if hasattr(self, 'match_all_var') else False
+        self.results = epg_repository.filter_by_genres(self.selected_genres, match_all)
 
         if self.results:
-            for item in self.results:
-                result_box = tk.Frame(self.results_frame, bg="#224477", bd=2, relief="groove")
-                result_box.pack(fill="x", padx=10, pady=6, anchor="w")
-                # Show name (title) on top, channel name below, both medium size
-                tk.Label(result_box, text=item["title"], bg="#224477", fg="white", font=("Arial", 14, "bold")).pack(anchor="w", padx=8, pady=(4,0))
-                tk.Label(result_box, text=item["channel"], bg="#224477", fg="#ffcc00", font=("Arial", 13)).pack(anchor="w", padx=8, pady=(0,2))
-                tk.Label(result_box, text=f"Genres: {item['genres']}", bg="#224477", fg="#99ffcc", font=("Arial", 11)).pack(anchor="w", padx=8)
-                tk.Label(result_box, text=f"{item['start']} - {item['stop']}", bg="#224477", fg="#cccccc", font=("Arial", 11, "italic")).pack(anchor="w", padx=8, pady=(0,4))
+            self.result_list.set_items(self.results)
         else:
-            tk.Label(self.results_frame, text="No results found for selected genres.", bg="#003366", fg="white", font=("Arial", 12)).pack(anchor="w", pady=5, padx=10)
+            self.result_list.show_message("No results found for selected genres.")
+
+    def show_result_description(self, item):
+        """Each result carries its program record and snapshot, so this is a direct lookup even after a refresh."""
+        if not hasattr(self, 'description_window'):
+            self.description_window = Description()
+        self.description_window.show_description(item["programme"], item["snapshot"])
 
 # --- Add a genre filter button to the top right corner of the main screen ---
 def add_genre_filter_button_to_main(main_screen):
@@ -545,18 +771,12 @@ def add_genre_filter_button_to_main(main_screen):
     genre_btn = tk.Button(main_screen.root, text="Genre Filter", command=open_genre_filter, font=("Arial", 12))
     genre_btn.place(relx=1.0, x=-250, y=10, anchor="ne")  # Adjust x for padding
 
-# Patch Mainscreen to add the genre filter button after initialization
-orig_display2 = Mainscreen.display
-def new_display2(self, *args, **kwargs):
-    orig_display2(self, *args, **kwargs)
-    add_genre_filter_button_to_main(self)
-Mainscreen.display = new_display2
-
 class Bookmark:
     def __init__(self):
-        self.bookmarked_channels = set()
+        self.bookmarked_channels = bookmark_store.names  # Saved between runs by bookmark_store
         self.root = None
         self.all_channels = []
+        self.row_views = []  # {display name: (star label, button)} for each channel list shown
 
     def bookmarkscreen(self):
         self.root = tk.Toplevel()
@@ -584,27 +804,20 @@ class Bookmark:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
+        when_guide_ready(self.root, self.show_all_channels, self._show_loading)
+
+    def show_all_channels(self):
         self.fetch_all_channels()
         self.display_bookmarks()
 
+    def _show_loading(self, text, fg):
+        for widget in self.bookmarks_frame.winfo_children():
+            widget.destroy()
+        tk.Label(self.bookmarks_frame, text=text, bg="#003366", fg=fg, font=("Arial", 12)).pack(anchor="w", pady=5, padx=10)
+
     def fetch_all_channels(self):
-        # Fetch all channels from the URL and store in self.all_channels
-        url = "https://xmltv.net/xml_files/Melbourne.xml"
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            xml_data = response.content
-            root = ET.fromstring(xml_data)
-            channels = []
-            for channel in root.findall('./channel'):
-                display_name = channel.findtext('display-name')
-                if display_name:
-                    channels.append(display_name)
-            self.all_channels = sorted(set(channels))
-        except Exception as e:
-            self.all_channels = []
-            tk.Label(self.bookmarks_frame, text=f"Failed to fetch channels: {e}", bg="#003366", fg="red", font=("Arial", 12)).pack(anchor="w", pady=5, padx=10)
+        # Read all channels from the shared EPG repository and store in self.all_channels
+        self.all_channels = epg_repository.channel_names()
 
     def display_bookmarks(self):
         for widget in self.bookmarks_frame.winfo_children():
@@ -612,66 +825,56 @@ class Bookmark:
         if not self.all_channels:
             tk.Label(self.bookmarks_frame, text="No channels found.", bg="#003366", fg="white", font=("Arial", 12)).pack(anchor="w", pady=5, padx=10)
             return
+        rows = {}
         for ch in self.all_channels:
-            row = tk.Frame(self.bookmarks_frame, bg="#224477", bd=1, relief="solid")
-            row.pack(fill="x", padx=8, pady=4, anchor="w")
-            is_bookmarked = ch in self.bookmarked_channels
-            star = "★ " if is_bookmarked else ""
-            star_color = "#FFD700" if is_bookmarked else "white"
-            tk.Label(row, text=star, bg="#224477", fg=star_color, font=("Arial", 13, "bold")).pack(side="left", padx=(8,0), pady=4)
-            tk.Label(row, text=ch, bg="#224477", fg="white", font=("Arial", 13)).pack(side="left", padx=(2,8), pady=4)
-            if is_bookmarked:
-                def make_remove(ch_name):
-                    return lambda: self.remove_channel_from_bookmarks(ch_name)
-                btn = tk.Button(row, text="Remove", command=make_remove(ch), font=("Arial", 11))
-                btn.pack(side="right", padx=8)
-            else:
-                def make_add(ch_name):
-                    return lambda: self.add_channel_to_bookmarks(ch_name)
-                btn = tk.Button(row, text="Bookmark", command=make_add(ch), font=("Arial", 11))
-                btn.pack(side="right", padx=8)
+            self.add_channel_row(self.bookmarks_frame, ch, rows)
+        self.row_views.append(rows)
+
+    def add_channel_row(self, frame, ch, rows):
+        """
+        Add a channel row (star, name and a Bookmark or Remove button) to frame and keep its
+        star and button in rows, so set_bookmark can flip them in place.
+        """
+        row = tk.Frame(frame, bg="#224477", bd=1, relief="solid")
+        row.pack(fill="x", padx=8, pady=4, anchor="w")
+        star = tk.Label(row, bg="#224477", font=("Arial", 13, "bold"))
+        star.pack(side="left", padx=(8,0), pady=4)
+        tk.Label(row, text=ch, bg="#224477", fg="white", font=("Arial", 13)).pack(side="left", padx=(2,8), pady=4)
+        btn = tk.Button(row, font=("Arial", 11))
+        btn.pack(side="right", padx=8)
+        rows[ch] = (star, btn)
+        self._show_row_state(ch, star, btn)
+
+    def _show_row_state(self, ch, star, btn):
+        is_bookmarked = ch in self.bookmarked_channels
+        star.config(text="★ " if is_bookmarked else "", fg="#FFD700" if is_bookmarked else "white")
+        if is_bookmarked:
+            btn.config(text="Remove", command=lambda: self.remove_channel_from_bookmarks(ch))
+        else:
+            btn.config(text="Bookmark", command=lambda: self.add_channel_to_bookmarks(ch))
 
     def add_channel_to_bookmarks(self, channel_name):
-        if channel_name not in self.bookmarked_channels:
-            self.bookmarked_channels.add(channel_name)
-            if self.root and self.root.winfo_exists():
-                self.display_bookmarks()
-        # Also update the main screen if it exists
-        if hasattr(self, "main_screen_ref") and self.main_screen_ref:
-            main_screen = self.main_screen_ref
-            if hasattr(main_screen, "sorted_channels"):
-                # Move bookmarked channels to the top, keep original order otherwise
-                bookmarked = []
-                non_bookmarked = []
-                for channel_id, display_name in main_screen.sorted_channels:
-                    if display_name in self.bookmarked_channels:
-                        bookmarked.append((channel_id, display_name))
-                    else:
-                        non_bookmarked.append((channel_id, display_name))
-                main_screen.sorted_channels = bookmarked + non_bookmarked
-            main_screen.update_channel_program_display()
+        self.set_bookmark(channel_name, True)
 
     def remove_channel_from_bookmarks(self, channel_name):
-        if channel_name in self.bookmarked_channels:
-            self.bookmarked_channels.remove(channel_name)
-            if self.root and self.root.winfo_exists():
-                self.display_bookmarks()
-        # Also update the main screen if it exists
-        if hasattr(self, "main_screen_ref") and self.main_screen_ref:
-            main_screen = self.main_screen_ref
-            if hasattr(main_screen, "sorted_channels"):
-                # Move bookmarks to top, but keep original order for non-bookmarked
-                bookmarked = []
-                non_bookmarked = []
-                for channel_id, display_name in main_screen.sorted_channels:
-                    if display_name in self.bookmarked_channels:
-                        bookmarked.append((channel_id, display_name))
-                    else:
-                        non_bookmarked.append((channel_id, display_name))
-                # To restore original order for non-bookmarked, re-sort them by display_name
-                orig_order = sorted(non_bookmarked, key=lambda x: x[1])
-                main_screen.sorted_channels = bookmarked + orig_order
-            main_screen.update_channel_program_display()
+        self.set_bookmark(channel_name, False)
+
+    def set_bookmark(self, channel_name, bookmarked):
+        """
+        Bookmark or un-bookmark a channel, save it, and update the channel's row in every open
+        channel list and the rows of the main screen that moved. Every bookmark button goes
+        through here.
+        """
+        if not bookmark_store.set(channel_name, bookmarked):
+            return
+        # Forget lists whose window has been closed, then flip this channel's star and button
+        self.row_views = [rows for rows in self.row_views if rows and next(iter(rows.values()))[0].winfo_exists()]
+        for rows in self.row_views:
+            if channel_name in rows:
+                self._show_row_state(channel_name, *rows[channel_name])
+        main_screen = getattr(self, "main_screen_ref", None)
+        if main_screen and hasattr(main_screen, "channel_order"):
+            main_screen.bookmark_changed(channel_name, bookmarked)
 
 # --- Add bookmark logic to Mainscreen ---
 def add_bookmark_button_to_main(main_screen):
@@ -695,7 +898,12 @@ def add_bookmark_button_to_main(main_screen):
 
     # Add a button to bookmark channels (shows all channels from the URL)
     def open_channel_list():
-        win = tk.Toplevel(main_screen.root)
+        # There is one channel list window; if it is open just bring it to the front
+        win = getattr(main_screen, 'channel_list_window', None)
+        if win is not None and win.winfo_exists():
+            win.lift()
+            return
+        win = main_screen.channel_list_window = tk.Toplevel(main_screen.root)
         win.title("All Channels")
         win.configure(bg="#003366")
         label = tk.Label(win, text="Channels", bg="#003366", fg="white", font=("Arial", 16, "bold"))
@@ -716,230 +924,38 @@ def add_bookmark_button_to_main(main_screen):
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-        # Fetch channels from the URL
-        url = "https://xmltv.net/xml_files/Melbourne.xml"
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            xml_data = response.content
-            root = ET.fromstring(xml_data)
-            channels = []
-            for channel in root.findall('./channel'):
-                display_name = channel.findtext('display-name')
-                if display_name:
-                    channels.append(display_name)
-            channels = sorted(set(channels))
-        except Exception as e:
-            tk.Label(frame, text=f"Failed to fetch channels: {e}", bg="#003366", fg="red", font=("Arial", 12)).pack(anchor="w", pady=5, padx=10)
-            return
+        loading = tk.Label(frame, bg="#003366", font=("Arial", 12))
 
-        bookmark_window = main_screen.bookmark_window
+        def show_loading(text, fg):
+            loading.config(text=text, fg=fg)
+            loading.pack(anchor="w", pady=5, padx=10)
 
-        # Show all channels with a bookmark or remove button and star icon if bookmarked
-        for ch in channels:
-            row = tk.Frame(frame, bg="#224477", bd=1, relief="solid")
-            row.pack(fill="x", padx=8, pady=4, anchor="w")
-            is_bookmarked = ch in bookmark_window.bookmarked_channels
-            star = "★ " if is_bookmarked else ""
-            star_color = "#FFD700" if is_bookmarked else "white"
-            tk.Label(row, text=star, bg="#224477", fg=star_color, font=("Arial", 13, "bold")).pack(side="left", padx=(8,0), pady=4)
-            tk.Label(row, text=ch, bg="#224477", fg="white", font=("Arial", 13)).pack(side="left", padx=(2,8), pady=4)
-            if is_bookmarked:
-                def make_remove(ch_name):
-                    return lambda: remove_channel_from_bookmarks(ch_name)
-                btn = tk.Button(row, text="Remove", command=make_remove(ch), font=("Arial", 11))
-                btn.pack(side="right", padx=8)
-            else:
-                def make_add(ch_name):
-                    return lambda: add_channel_to_bookmarks(ch_name)
-                btn = tk.Button(row, text="Bookmark", command=make_add(ch), font=("Arial", 11))
-                btn.pack(side="right", padx=8)
-
-        def add_channel_to_bookmarks(channel_name):
-            if channel_name not in bookmark_window.bookmarked_channels:
-                bookmark_window.bookmarked_channels.add(channel_name)
-                if bookmark_window.root and bookmark_window.root.winfo_exists():
-                    bookmark_window.display_bookmarks()
-            # Also update the main screen display and move bookmarks to top
-            if hasattr(main_screen, "sorted_channels"):
-                bookmarked = []
-                non_bookmarked = []
-                for channel_id, display_name in main_screen.sorted_channels:
-                    if display_name in bookmark_window.bookmarked_channels:
-                        bookmarked.append((channel_id, display_name))
-                    else:
-                        non_bookmarked.append((channel_id, display_name))
-                main_screen.sorted_channels = bookmarked + non_bookmarked
-            main_screen.update_channel_program_display()
-            # Refresh this window to update star and button
-            win.destroy()
-            open_channel_list()
-
-        def remove_channel_from_bookmarks(channel_name):
-            if channel_name in bookmark_window.bookmarked_channels:
-                bookmark_window.bookmarked_channels.remove(channel_name)
-                if bookmark_window.root and bookmark_window.root.winfo_exists():
-                    bookmark_window.display_bookmarks()
-            # Also update the main screen display and move bookmarks to top
-            if hasattr(main_screen, "sorted_channels"):
-                bookmarked = []
-                non_bookmarked = []
-                for channel_id, display_name in main_screen.sorted_channels:
-                    if display_name in bookmark_window.bookmarked_channels:
-                        bookmarked.append((channel_id, display_name))
-                    else:
-                        non_bookmarked.append((channel_id, display_name))
-                # Restore original order for non-bookmarked
-                orig_order = sorted(non_bookmarked, key=lambda x: x[1])
-                main_screen.sorted_channels = bookmarked + orig_order
-            main_screen.update_channel_program_display()
-            # Refresh this window to update star and button
-            win.destroy()
-            open_channel_list()
+        def show_channels():
+            # Channels come from the data the shared EPG repository has loaded
+            loading.destroy()
+            bookmark_window = main_screen.bookmark_window
+            # Show all channels with a bookmark or remove button and star icon if bookmarked.
+            # The window stays open: a click only flips the star and button of its own row.
+            rows = {}
+            for ch in epg_repository.channel_names():
+                bookmark_window.add_channel_row(frame, ch, rows)
+            bookmark_window.row_views.append(rows)
+        when_guide_ready(win, show_channels, show_loading)
 
     # Add the "Add Channel Bookmark" button to the main screen (top right, next to others)
     channel_btn = tk.Button(main_screen.root, text="Bookmark Channel", command=open_channel_list, font=("Arial", 12))
     channel_btn.place(relx=1.0, x=-380, y=10, anchor="ne")  # Adjust x for padding
 
-# Patch Mainscreen to add the bookmark button logic after initialization
-orig_display3 = Mainscreen.display
-def new_display3(self, *args, **kwargs):
-    orig_display3(self, *args, **kwargs)
-    add_bookmark_button_to_main(self)
-Mainscreen.display = new_display3
-
-# --- Patch Mainscreen to show bookmarked channels at the top with a yellow star icon ---
-orig_update_channel_program_display = getattr(Mainscreen, "_update_channel_program_display", None)
-def patched_update_channel_program_display(self):
-    # Get bookmarks if available
-    bookmarked_channels = set()
-    if hasattr(self, "bookmark_window"):
-        bookmarked_channels = self.bookmark_window.bookmarked_channels
-
-    # Remove previous widgets if any
-    if hasattr(self, 'channel_prog_widgets'):
-        for widgets in self.channel_prog_widgets:
-            for w in widgets:
-                w.destroy()
-    self.channel_prog_widgets = []
-
-    sorted_channels = getattr(self, 'sorted_channels', [])
-    programs_by_channel = getattr(self, 'programs_by_channel', {})
-    y_offset = 200
-    x_channel = 40  # Channel buttons
-    x_program = x_channel + 220  # Move programs further right
-    max_channels = self.channels_per_page
-    program_box_width = 38
-    program_box_height = 3
-    program_box_x_spacing = 200
-
-    now_utc = datetime.datetime.utcnow()
-
-    # Separate bookmarked and non-bookmarked channels, keep original order for non-bookmarked
-    bookmarked = []
-    non_bookmarked = []
-    for channel_id, display_name in sorted_channels:
-        if display_name in bookmarked_channels:
-            bookmarked.append((channel_id, display_name))
-        else:
-            non_bookmarked.append((channel_id, display_name))
-
-    # Only show up to max_channels, but always show all bookmarks at the top
-    display_channels = bookmarked + non_bookmarked
-    display_channels = display_channels[:max_channels]
-
-    for idx, (channel_id, display_name) in enumerate(display_channels):
-        widgets = []
-        # Add yellow star icon for bookmarked channels at the top
-        is_bookmarked = display_name in bookmarked_channels and idx < len(bookmarked)
-        star = "★ " if is_bookmarked else ""
-        star_color = "#FFD700" if is_bookmarked else "black"
-        btn_channel = tk.Button(
-            self.root,
-            text=star + display_name,
-            width=30,
-            height=program_box_height,
-            fg=star_color
-        )
-        btn_channel.place(x=x_channel, y=y_offset)
-        widgets.append(btn_channel)
-        # Find up to 6 programs: current and next 5
-        programs = programs_by_channel.get(channel_id, [])
-        prog_indices = []
-        found_current = False
-        for i, prog in enumerate(programs):
-            try:
-                start_dt = datetime.datetime.strptime(prog['start'][:14], "%Y%m%d%H%M%S")
-                stop_dt = datetime.datetime.strptime(prog['stop'][:14], "%Y%m%d%H%M%S")
-            except Exception:
-                continue
-            if start_dt <= now_utc < stop_dt:
-                prog_indices = list(range(i, min(i + 6, len(programs))))
-                found_current = True
-                break
-            elif now_utc < start_dt and not found_current:
-                prog_indices = list(range(i, min(i + 6, len(programs))))
-                break
-        if not prog_indices and programs:
-            prog_indices = list(range(min(6, len(programs))))
-        for j, prog_idx in enumerate(prog_indices):
-            prog = programs[prog_idx]
-            try:
-                start_dt = datetime.datetime.strptime(prog['start'][:14], "%Y%m%d%H%M%S")
-                stop_dt = datetime.datetime.strptime(prog['stop'][:14], "%Y%m%d%H%M%S")
-                start_str = start_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%H:%M")
-                stop_str = stop_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%H:%M")
-            except Exception as e:
-                start_str = stop_str = ""
-                start_dt = stop_dt = None
-            if start_dt and stop_dt and start_dt <= now_utc < stop_dt:
-                prog_text = f"Now: {prog['title']} ({start_str}-{stop_str})"
-                bg_color = "#e0ffe0"
-            else:
-                prog_text = f"{prog['title']} ({start_str}-{stop_str})"
-                bg_color = "#ffffe0"
-            btn_prog = tk.Button(
-                self.root,
-                text=prog_text,
-                width=program_box_width,
-                height=program_box_height,
-                bg=bg_color,
-                wraplength=300,
-                anchor="w",
-                justify="left"
-            )
-            btn_prog.place(x=x_program + j * program_box_x_spacing, y=y_offset)
-            widgets.append(btn_prog)
-        self.channel_prog_widgets.append(widgets)
-        y_offset += 55
-
-Mainscreen._update_channel_program_display = patched_update_channel_program_display
-
-
-# Patch Mainscreen to add description popups to existing program buttons
-# --- Description popup logic for program buttons on Mainscreen ---
-
-# --- Description popup logic for program buttons on Mainscreen ---
+# Grid cells and search/filter results use these classes to show description popups
 class ChannelDescription:
     def __init__(self):
         self.channel_descriptions = {}
 
     def fetch_channel_descriptions(self):
-        url = "https://xmltv.net/xml_files/Melbourne.xml"
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            xml_data = response.content
-            root = ET.fromstring(xml_data)
-            for channel in root.findall('./channel'):
-                channel_id = channel.get('id')
-                display_name = channel.findtext('display-name')
-                desc = channel.findtext('desc') or "No description available."
-                if channel_id and display_name:
-                    self.channel_descriptions[display_name] = desc
-        except Exception:
+        # Only grid cells call this, and the grid only has cells once the guide is loaded
+        if epg_repository.available():
+            self.channel_descriptions = epg_repository.channel_descriptions
+        else:
             self.channel_descriptions = {}
 
     def show_channel_description(self, display_name):
@@ -947,227 +963,21 @@ class ChannelDescription:
         messagebox.showinfo(f"{display_name} - Channel Description", desc)
 
 class Description:
-    def __init__(self, main_screen=None):
-        self.main_screen = main_screen
-        self.program_descriptions = {}
+    def show_description(self, programme, snapshot=None):
+        """
+        Show the description of a program record (from the grid or a search/filter result, which
+        also gives the snapshot it came from).
+        """
+        desc = epg_repository.programme_description(programme, snapshot) or "No description available."
+        messagebox.showinfo(f"{programme.title} - Description", desc)
 
-    def fetch_program_descriptions(self):
-        url = "https://xmltv.net/xml_files/Melbourne.xml"
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            xml_data = response.content
-            root = ET.fromstring(xml_data)
-            for programme in root.findall('./programme'):
-                channel_id = programme.get('channel')
-                start = programme.get('start')
-                stop = programme.get('stop')
-                title = programme.findtext('title') or ""
-                desc = programme.findtext('desc') or "No description available."
-                key = (channel_id, start, stop, title)
-                self.program_descriptions[key] = desc
-        except Exception:
-            self.program_descriptions = {}
-
-    def show_description(self, channel_id, start, stop, title):
-        key = (channel_id, start, stop, title)
-        desc = self.program_descriptions.get(key, "No description available.")
-        messagebox.showinfo(f"{title} - Description", desc)
-
-# Patch Mainscreen channel and program buttons for description popups
-def patch_mainscreen_for_descriptions():
-    orig_update = Mainscreen._update_channel_program_display
-    def new_update(self):
-        orig_update(self)
-        # Attach channel description logic to channel buttons
-        if not hasattr(self, 'channel_description_window'):
-            self.channel_description_window = ChannelDescription()
-            self.channel_description_window.fetch_channel_descriptions()
-        chan_desc_window = self.channel_description_window
 
-        if not hasattr(self, 'description_window'):
-            self.description_window = Description(self)
-            self.description_window.fetch_program_descriptions()
-        desc_window = self.description_window
-
-        if hasattr(self, 'channel_prog_widgets'):
-            # Map display_name to channel_id for quick lookup
-            display_to_id = {display_name: channel_id for channel_id, display_name in getattr(self, 'sorted_channels', [])}
-            for widgets in self.channel_prog_widgets:
-                # Channel button
-                channel_btn = widgets[0]
-                channel_btn_text = channel_btn.cget("text").replace("★ ", "")
-                channel_btn.config(command=lambda name=channel_btn_text: chan_desc_window.show_channel_description(name))
-                # Program buttons
-                channel_id = display_to_id.get(channel_btn_text)
-                for btn in widgets[1:]:
-                    prog_text = btn.cget("text")
-                    m = re.match(r"(?:Now:\s*)?(.*) \((\d{2}:\d{2})-(\d{2}:\d{2})\)", prog_text)
-                    if m:
-                        title, start_str, stop_str = m.groups()
-                        prog_match = None
-                        if channel_id:
-                            for prog in self.programs_by_channel.get(channel_id, []):
-                                if prog['title'] == title:
-                                    try:
-                                        start_dt = datetime.datetime.strptime(prog['start'][:14], "%Y%m%d%H%M%S")
-                                        stop_dt = datetime.datetime.strptime(prog['stop'][:14], "%Y%m%d%H%M%S")
-                                        start_local = start_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%H:%M")
-                                        stop_local = stop_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%H:%M")
-                                        if start_local == start_str and stop_local == stop_str:
-                                            prog_match = prog
-                                            break
-                                    except Exception:
-                                        continue
-                        if channel_id and prog_match:
-                            btn.config(command=lambda cid=channel_id, st=prog_match['start'], sp=prog_match['stop'], t=title:
-                                       desc_window.show_description(cid, st, sp, t))
-                        else:
-                            btn.config(command=lambda: messagebox.showinfo("Description", "No description available."))
-    Mainscreen._update_channel_program_display = new_update
-
-patch_mainscreen_for_descriptions()
-
-# --- Patch Search results for description popups ---
-orig_search = Search.search
-def new_search(self, term):
-    orig_search(self, term)
-    # Attach description logic to search result boxes
-    if not hasattr(self, 'description_window'):
-        self.description_window = Description()
-        self.description_window.fetch_program_descriptions()
-    desc_window = self.description_window
-
-    # Build a mapping from (channel, title, start, stop) to description
-    # Already done in desc_window.program_descriptions
-
-    # Map channel display name to channel_id for lookup
-    # We'll need to fetch this mapping
-    url = "https://xmltv.net/xml_files/Melbourne.xml"
-    channel_name_to_id = {}
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        xml_data = response.content
-        root = ET.fromstring(xml_data)
-        for channel in root.findall('./channel'):
-            channel_id = channel.get('id')
-            display_name = channel.findtext('display-name')
-            if channel_id and display_name:
-                channel_name_to_id[display_name] = channel_id
-    except Exception:
-        pass
-
-    # Attach click event to each result_box (for all results)
-    if hasattr(self, 'results_frame'):
-        children = self.results_frame.winfo_children()
-        for i, item in enumerate(self.results):
-            if i < len(children):
-                result_box = children[i]
-                # Find channel_id
-                channel_id = channel_name_to_id.get(item["channel"])
-                title = item["title"]
-                # Parse start and stop as in Description
-                start = item["start"]
-                stop = item["stop"]
-                # Try to find the original UTC start/stop from the XML
-                prog_start = prog_stop = None
-                try:
-                    for programme in root.findall('./programme'):
-                        prog_title = programme.findtext('title') or ""
-                        ch_id = programme.get('channel')
-                        if ch_id == channel_id and prog_title == title:
-                            # Compare local time string
-                            start_dt = datetime.datetime.strptime(programme.get('start')[:14], "%Y%m%d%H%M%S")
-                            stop_dt = datetime.datetime.strptime(programme.get('stop')[:14], "%Y%m%d%H%M%S")
-                            start_local = start_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%Y-%m-%d %H:%M")
-                            stop_local = stop_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%H:%M")
-                            if start_local == start and stop_local == stop:
-                                prog_start = programme.get('start')
-                                prog_stop = programme.get('stop')
-                                break
-                except Exception:
-                    pass
-
-                def make_show_desc(cid=channel_id, st=prog_start, sp=prog_stop, t=title):
-                    return lambda e: desc_window.show_description(cid, st, sp, t) if cid and st and sp else messagebox.showinfo("Description", "No description available.")
-
-                # Bind left-click to show description
-                result_box.bind("<Button-1>", make_show_desc())
-                # Also change cursor on hover for better UX
-                result_box.config(cursor="hand2")
-
-Search.search = new_search
-
-# --- Patch GenreFilter results for description popups ---
-orig_apply_filter = GenreFilter.apply_filter
-def new_apply_filter(self):
-    orig_apply_filter(self)
-    # Attach description logic to genre filter result boxes
-    if not hasattr(self, 'description_window'):
-        self.description_window = Description()
-        self.description_window.fetch_program_descriptions()
-    desc_window = self.description_window
-
-    # Map channel display name to channel_id for lookup
-    url = "https://xmltv.net/xml_files/Melbourne.xml"
-    channel_name_to_id = {}
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        xml_data = response.content
-        root = ET.fromstring(xml_data)
-        for channel in root.findall('./channel'):
-            channel_id = channel.get('id')
-            display_name = channel.findtext('display-name')
-            if channel_id and display_name:
-                channel_name_to_id[display_name] = channel_id
-    except Exception:
-        pass
-
-    # Attach click event to each result_box (for all results)
-    if hasattr(self, 'results_frame'):
-        children = self.results_frame.winfo_children()
-        for i, item in enumerate(self.results):
-            if i < len(children):
-                result_box = children[i]
-                # Find channel_id
-                channel_id = channel_name_to_id.get(item["channel"])
-                title = item["title"]
-                # Parse start and stop as in Description
-                start = item["start"]
-                stop = item["stop"]
-                # Try to find the original UTC start/stop from the XML
-                prog_start = prog_stop = None
-                try:
-                    for programme in root.findall('./programme'):
-                        prog_title = programme.findtext('title') or ""
-                        ch_id = programme.get('channel')
-                        if ch_id == channel_id and prog_title == title:
-                            # Compare local time string
-                            start_dt = datetime.datetime.strptime(programme.get('start')[:14], "%Y%m%d%H%M%S")
-                            stop_dt = datetime.datetime.strptime(programme.get('stop')[:14], "%Y%m%d%H%M%S")
-                            start_local = start_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%Y-%m-%d %H:%M")
-                            stop_local = stop_dt.replace(tzinfo=datetime.timezone.utc).astimezone().strftime("%H:%M")
-                            if start_local == start and stop_local == stop:
-                                prog_start = programme.get('start')
-                                prog_stop = programme.get('stop')
-                                break
-                except Exception:
-                    pass
-
-                def make_show_desc(cid=channel_id, st=prog_start, sp=prog_stop, t=title):
-                    return lambda e: desc_window.show_description(cid, st, sp, t) if cid and st and sp else messagebox.showinfo("Description", "No description available.")
-
-                # Bind left-click to show description
-                result_box.bind("<Button-1>", make_show_desc())
-                # Also change cursor on hover for better UX
-                result_box.config(cursor="hand2")
-
-GenreFilter.apply_filter = new_apply_filter
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TV Organiser")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="append every timing to FILE as a JSON line ('-' for stdout), like TV_ORGANISER_METRICS")
+    args = parser.parse_args()
+    if args.metrics:
+        perf_metrics.jsonl_path = args.metrics
     main_screen = Mainscreen(None)
     main_screen.run() 
@@ -0,0 +1,257 @@
+#Importing neccesary Libraries
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from xml.sax.saxutils import escape
+
+import epg_engine
+import make_synthetic_feed
+
+'''
+This script benchmarks the guide without a display or the network.
+It writes synthetic feeds (see make_synthetic_feed.py) at a few sizes and, for each one, times
+and memory-profiles parsing the feed, building programs_by_channel and the other indexes,
+now/next lookups, search and the genre filter (the engine calls behind Search.search and
+GenreFilter.apply_filter) and description lookups.
+It also checks that the SQLite backend answers search, the genre filter and now/next with the
+same programs as the in-memory indexes, on each feed and on a few titles with accents and
+underscores that are easy to tokenize differently.
+The results are written as JSON; pass an earlier results file with --compare to see what changed.
+'''
+# name -> (channels, days, programmes per channel per day)
+SIZES = {
+    "small": (20, 2, 24),
+    "medium": (100, 7, 30),
+    "large": (300, 7, 30),
+}
+# Slower or bigger than the baseline by more than this fraction is reported as a regression
+THRESHOLD = 0.10
+# Titles and search terms the two backends could split or fold differently
+EDGE_TITLES = ["Café Society", "snake_case Show", "Naïve Art", "Ångström Files", "ΑΘΗΝΑ Live", "Part 2²"]
+EDGE_TERMS = ["cafe", "café", "caf", "case", "snake_c", "snake case", "naive", "naï", "ångström", "αθηνα", "2"]
+
+def measure(fn, repeat):
+    """
+    Run fn repeat times for timing, then once more under tracemalloc.
+    Returns (stats, result of the last run). Peak is the most memory allocated at once while fn
+    ran; retained is what was still allocated afterwards, i.e. the size of what fn returned.
+    """
+    times = []
+    for _ in range(repeat):
+        result = None  # Let the previous result go before the next run
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    result = None
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = {
+        "best_s": min(times),
+        "median_s": statistics.median(times),
+        "peak_kb": round((peak - before) / 1024, 1),
+        "retained_kb": round((current - before) / 1024, 1),
+    }
+    return stats, result
+
+def write_edge_feed(path):
+    """Write a small XMLTV feed with one channel showing EDGE_TITLES, one an hour."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n'
+                '  <channel id="edge.au"><display-name>Edge</display-name></channel>\n')
+        for hour, title in enumerate(EDGE_TITLES):
+            f.write(f'  <programme start="20240101{hour:02d}0000 +0000" stop="20240101{hour + 1:02d}0000 +0000" '
+                    f'channel="edge.au"><title>{escape(title)}</title><category>Edge</category></programme>\n')
+        f.write('</tv>\n')
+
+def check_backends(path, terms, genre_sets, times):
+    """
+    Ingest the feed at path into an SQLiteGuide and compare the program ids it returns for the
+    search terms, genre sets and now/next times with the in-memory indexes of the same snapshot.
+    Returns a list of the mismatches.
+    """
+    snapshot = epg_engine.EPGSnapshot(0, epg_engine.iter_xmltv(path), (os.path.getsize(path), 0))
+    mismatches = []
+    with tempfile.TemporaryDirectory() as folder:
+        guide = epg_engine.SQLiteGuide(os.path.join(folder, "guide.db"))
+        guide.ingest(snapshot)
+        stamp = snapshot.stamp
+        if guide.fts:
+            for term in terms:
+                if guide.search_titles(stamp, term) != snapshot.title_index.search(term):
+                    mismatches.append(f"search {term!r}")
+        for genres, match_all in genre_sets:
+            if guide.genre_ids(stamp, genres, match_all) != snapshot.genre_ids(genres, match_all):
+                mismatches.append(f"filter {genres} match_all={match_all}")
+        for channel_id, name in snapshot.sorted_channels:
+            for t in times:
+                if guide.now_and_next_ids(stamp, channel_id, t) != [p.id for p in snapshot.now_and_next(channel_id, t)]:
+                    mismatches.append(f"now/next {channel_id} at {t}")
+        guide.close()
+    return mismatches
+
+def bench_size(path, repeat, version):
+    """Run every benchmark on the feed at path. version must be higher than any installed before."""
+    repository = epg_engine.epg_repository
+    stages = {}
+
+    def record(name, fn, calls=1, **extra):
+        stats, result = measure(fn, repeat)
+        stats["calls"] = calls
+        stats["per_call_us"] = round(stats["best_s"] / calls * 1e6, 2)
+        stats.update(extra)
+        stages[name] = stats
+        print(f"  {name:<12} {stats['best_s'] * 1000:9.2f} ms  peak {stats['peak_kb']:10.1f} KB  "
+              f"retained {stats['retained_kb']:10.1f} KB")
+        return result
+
+    # Parse: stream the XML into a snapshot, including building its indexes
+    snapshot = record("parse", lambda: epg_engine.EPGSnapshot(version, epg_engine.iter_xmltv(path)))
+    repository.install(snapshot)
+
+    # Index build on its own: programs_by_channel, start/stop indexes and genre postings
+    record("build_index", lambda: epg_engine.EPGSnapshot.from_parts(
+        version, None, dict(snapshot.channel_map), dict(snapshot.channel_descriptions),
+        snapshot.programmes, snapshot.descriptions, snapshot.title_index))
+
+    # Now/next for every channel at a spread of times, as the main grid asks for it
+    first, last = snapshot.time_range
+    times = [first + (last - first) * i // 24 for i in range(24)]
+    channels = [channel_id for channel_id, name in snapshot.sorted_channels]
+    def now_next():
+        return [repository.now_and_next(channel_id, t) for t in times for channel_id in channels]
+    record("now_next", now_next, calls=len(times) * len(channels))
+
+    # Search: whole words, prefixes and two word queries, with the result dicts the screen shows
+    terms = ["ocean", "mou", "s", "great story", "kit", "the missing word"]
+    found = []
+    def search():
+        found.clear()
+        results = [repository.search(term) for term in terms]
+        found.extend(len(r) for r in results)
+        return results
+    record("search", search, calls=len(terms), results=found)
+
+    # Genre filter: one genre, any of two, all of two
+    genre_sets = [(["News"], False), (["Drama", "Comedy"], False), (["Drama", "Comedy"], True)]
+    matched = []
+    def genre_filter():
+        matched.clear()
+        results = [repository.filter_by_genres(genres, match_all) for genres, match_all in genre_sets]
+        matched.extend(len(r) for r in results)
+        return results
+    record("filter", genre_filter, calls=len(genre_sets), results=matched)
+
+    # Description lookups of random programmes, mostly missing the LRU cache
+    rnd = random.Random(1)
+    sample = [snapshot.programmes[rnd.randrange(len(snapshot.programmes))] for _ in range(5000)]
+    def descriptions():
+        return [repository.programme_description(programme) for programme in sample]
+    record("description", descriptions, calls=len(sample))
+
+    mismatches = check_backends(path, terms, genre_sets, times)
+    for mismatch in mismatches:
+        print(f"  SQLite backend differs: {mismatch}")
+
+    return {
+        "programmes": len(snapshot.programmes),
+        "channels": len(snapshot.channel_map),
+        "feed_bytes": os.path.getsize(path),
+        "stages": stages,
+        "backend_mismatches": mismatches,
+    }
+
+def compare(results, baseline):
+    """Print the change of every stage against an earlier results file. Returns the regressions."""
+    regressions = []
+    print(f"\nCompared with {baseline.get('created', 'baseline')}:")
+    for size, result in results["sizes"].items():
+        old = baseline.get("sizes", {}).get(size)
+        if old is None or old.get("settings") != result["settings"]:
+            print(f"  {size}: not in the baseline with the same settings")
+            continue
+        for stage, stats in result["stages"].items():
+            old_stats = old["stages"].get(stage)
+            if old_stats is None:
+                continue
+            lines = []
+            for key in ("best_s", "peak_kb", "retained_kb"):
+                if old_stats[key] <= 0:
+                    continue
+                change = stats[key] / old_stats[key] - 1
+                lines.append(f"{key} {change:+7.1%}")
+                if change > THRESHOLD:
+                    regressions.append((size, stage, key, change))
+            print(f"  {size:<7} {stage:<12} " + "  ".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} measurements are more than {THRESHOLD:.0%} worse:")
+        for size, stage, key, change in regressions:
+            print(f"  {size} {stage} {key} {change:+.1%}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the guide on synthetic feeds.")
+    parser.add_argument("--sizes", default="small,medium",
+                        help=f"comma separated sizes to run, from {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs of each stage, the best is kept")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", default="bench_output.json", help="where to write the results")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help=f"exit with status 1 if anything is more than {THRESHOLD:.0%} worse than --compare")
+    args = parser.parse_args(argv)
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    for size in sizes:
+        if size not in SIZES:
+            parser.error(f"unknown size {size!r}")
+
+    results = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory() as folder:
+        edge_path = os.path.join(folder, "edge.xml")
+        write_edge_feed(edge_path)
+        mismatches = check_backends(edge_path, EDGE_TERMS, [(["Edge"], False)], [1704067200, 1704078000])
+        for mismatch in mismatches:
+            print(f"SQLite backend differs on the edge case titles: {mismatch}")
+        results["backend_mismatches"] = mismatches
+        for version, size in enumerate(sizes, start=1):
+            channels, days, per_day = SIZES[size]
+            path = os.path.join(folder, f"{size}.xml")
+            with open(path, "w", encoding="utf-8") as f:
+                make_synthetic_feed.write_feed(f, channels, days, per_day, seed=args.seed)
+            print(f"{size}: {channels} channels x {days} days x {per_day} programmes")
+            result = bench_size(path, args.repeat, version)
+            result["settings"] = {"channels": channels, "days": days, "per_day": per_day, "seed": args.seed}
+            results["sizes"][size] = result
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if mismatches or any(result["backend_mismatches"] for result in results["sizes"].values()):
+        print("The SQLite backend does not return the same programs as the in-memory indexes")
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f))
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
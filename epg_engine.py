@@ -0,0 +1,1723 @@
+#Importing neccesary Libraries
+import datetime
+import threading
+import re
+import os
+import json
+import queue
+import time
+import calendar
+import sys
+import bisect
+import tempfile
+import shutil
+import struct
+import sqlite3
+import hashlib
+import math
+import csv
+import argparse
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager, redirect_stdout
+from itertools import accumulate
+from types import MappingProxyType
+#Importing the inbuilt xml library to access the api data
+import xml.etree.ElementTree as ET
+
+'''
+This module is the EPG engine of the TV Organiser: fetching the XMLTV feeds, parsing them and
+answering the guide's queries (now/next, time ranges, title search, genre filter, channel and
+program descriptions, bookmarks). It does not use tkinter, and requests is only imported when
+a feed is first fetched, so scripts and worker processes can use it without a display.
+"SAT Code.py" is the Tk front end and only renders what this module returns.
+'''
+EPG_URL = "https://xmltv.net/xml_files/Melbourne.xml"
+# Local folder for the cached feed and other saved data
+APP_DIR = os.path.join(os.path.expanduser("~"), ".tv_organiser")
+# Optional list of feeds to show instead of EPG_URL (see load_feed_urls)
+FEEDS_FILE = os.path.join(APP_DIR, "feeds.json")
+# Where the parsed guide is queried from: "memory" (indexes built in Python) or "sqlite" (SQLiteGuide)
+EPG_BACKEND = os.environ.get("TV_ORGANISER_BACKEND", "memory")
+# File to append a JSON line to for every timed operation ("-" for stdout), see PerfMetrics
+METRICS_FILE = os.environ.get("TV_ORGANISER_METRICS")
+
+def load_feed_urls(path=None):
+    """
+    URLs of the XMLTV feeds to show, read from FEEDS_FILE: a JSON list such as
+    ["https://xmltv.net/xml_files/Melbourne.xml", "https://xmltv.net/xml_files/Sydney.xml"].
+    When two feeds list the same channel id the earlier feed is used for it.
+    Falls back to EPG_URL if the file is missing or empty.
+    """
+    try:
+        with open(path or FEEDS_FILE, "r", encoding="utf-8") as f:
+            urls = [url.strip() for url in json.load(f) if isinstance(url, str) and url.strip()]
+    except Exception:
+        urls = []
+    return list(dict.fromkeys(urls)) or [EPG_URL]
+
+def make_session(pool_size):
+    """A requests.Session whose connection pool can serve pool_size feeds at the same time."""
+    # Imported here so the engine can be used on saved data without requests being loaded
+    import requests
+    import requests.adapters
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({'User-Agent': 'Mozilla/5.0'})
+    return session
+
+class PerfMetrics:
+    '''
+    This class collects timings of the hot paths: fetch, parse, index build, grid render,
+    search and filter. Each one is wrapped in timed(name), which keeps the most recent
+    durations (history of them) so the last and 95th percentile times can be shown by the
+    performance overlay on the main screen. Counters such as the number of widgets a render
+    created can be added to the dict timed() yields and are kept with the timing.
+    If jsonl_path is set every timing is also appended to that file as one JSON line, for
+    looking at offline. Timings can come from any thread.
+    '''
+    def __init__(self, history=200, jsonl_path=None):
+        self.history = history
+        self.jsonl_path = jsonl_path
+        self.timings = {}  # name -> deque of the most recent durations in seconds
+        self.counters = {}  # name -> counters recorded with its last timing
+        self._lock = threading.Lock()
+        self._jsonl = None
+
+    @contextmanager
+    def timed(self, name):
+        """Time the body of a with block; counters put in the yielded dict are recorded with it."""
+        counters = {}
+        start = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            self.record(name, time.perf_counter() - start, counters)
+
+    def record(self, name, seconds, counters=None):
+        counters = counters or {}
+        with self._lock:
+            self.timings.setdefault(name, deque(maxlen=self.history)).append(seconds)
+            self.counters[name] = counters
+            if self.jsonl_path:
+                self._write_line({"time": time.time(), "name": name, "seconds": seconds, **counters})
+
+    def _write_line(self, entry):
+        try:
+            if self._jsonl is None:
+                self._jsonl = sys.stdout if self.jsonl_path == "-" else open(self.jsonl_path, "a", encoding="utf-8")
+            self._jsonl.write(json.dumps(entry) + "\n")
+            self._jsonl.flush()
+        except Exception as e:
+            print(f"Error writing metrics: {e}")
+            self.jsonl_path = None
+
+    def last(self, name):
+        """Most recent duration of name in seconds, or None."""
+        with self._lock:
+            values = self.timings.get(name)
+            return values[-1] if values else None
+
+    def p95(self, name):
+        """95th percentile (nearest rank) of the recent durations of name in seconds, or None."""
+        with self._lock:
+            values = sorted(self.timings.get(name, ()))
+        if not values:
+            return None
+        return values[math.ceil(0.95 * len(values)) - 1]
+
+    def summary(self):
+        """(name, last, p95, number of timings kept, last counters) for every name, sorted by name."""
+        with self._lock:
+            names = sorted(self.timings)
+        rows = []
+        for name in names:
+            with self._lock:
+                count = len(self.timings[name])
+                counters = dict(self.counters.get(name, {}))
+            rows.append((name, self.last(name), self.p95(name), count, counters))
+        return rows
+
+# One set of metrics shared by the whole process
+perf_metrics = PerfMetrics(jsonl_path=METRICS_FILE)
+
+class FeedCache:
+    '''
+    This class keeps an on-disk copy of the raw XMLTV feed and revalidates it with the server.
+    Requests go through a pooled requests.Session (shared by all feeds when one is passed in)
+    and send If-None-Match / If-Modified-Since
+    using the ETag and Last-Modified headers saved from the previous download. A 304 reply
+    means the cached file is still current, so nothing is transferred and nothing is re-parsed.
+    hits counts 304 replies, misses counts full downloads.
+    '''
+    def __init__(self, url, cache_dir=None, session=None):
+        self.url = url
+        self.cache_dir = cache_dir or os.path.join(APP_DIR, "cache")
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", url.split("://", 1)[-1])
+        self.path = os.path.join(self.cache_dir, name)
+        self.meta_path = self.path + ".json"
+        self._session = session
+        self.etag = None
+        self.last_modified = None
+        self.hits = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        self._load_meta()
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.etag = meta.get("etag")
+            self.last_modified = meta.get("last_modified")
+        except Exception:
+            self.etag = self.last_modified = None
+
+    def _save_meta(self):
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"url": self.url, "etag": self.etag, "last_modified": self.last_modified}, f)
+
+    @property
+    def session(self):
+        """The session to fetch with, made on first use if none was passed in."""
+        if self._session is None:
+            self._session = make_session(1)
+        return self._session
+
+    @session.setter
+    def session(self, session):
+        self._session = session
+
+    def has_copy(self):
+        return os.path.exists(self.path)
+
+    def stamp(self):
+        """(size, modification time in ns) of the cached copy, or None if there is no copy."""
+        try:
+            info = os.stat(self.path)
+        except OSError:
+            return None
+        return (info.st_size, info.st_mtime_ns)
+
+    def fetch(self):
+        """
+        Revalidate the cached feed against the server.
+        Returns True if a new copy was downloaded, False if the cached copy is still current.
+        """
+        with perf_metrics.timed("fetch") as counters:
+            headers = {}
+            if self.has_copy():
+                if self.etag:
+                    headers['If-None-Match'] = self.etag
+                if self.last_modified:
+                    headers['If-Modified-Since'] = self.last_modified
+            # Stream the body to disk in chunks so the raw feed is never held in memory
+            with self.session.get(self.url, headers=headers, timeout=10, stream=True) as response:
+                if response.status_code == 304 and self.has_copy():
+                    self.hits += 1
+                    self.bytes_saved += os.path.getsize(self.path)
+                    counters["not_modified"] = 1
+                    return False
+                response.raise_for_status()
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # Write to a temporary file first so a failed write never leaves a broken cache
+                tmp_path = self.path + ".tmp"
+                size = 0
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(tmp_path, self.path)
+                self.etag = response.headers.get('ETag')
+                self.last_modified = response.headers.get('Last-Modified')
+            self._save_meta()
+            self.misses += 1
+            self.bytes_downloaded += size
+            counters["bytes"] = size
+            return True
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_saved": self.bytes_saved
+        }
+
+def parse_xmltv_time(value):
+    """
+    Convert an XMLTV timestamp such as "20240101193000 +1000" to integer epoch seconds.
+    The offset is honoured; a timestamp without one is taken as UTC, and missing trailing fields
+    (e.g. "202401011930") are the start of that period.
+    Raises ValueError for a malformed value, including an empty or missing (None) one and a
+    date that does not exist.
+    """
+    parts = value.split() if isinstance(value, str) else ()
+    if (not 1 <= len(parts) <= 2 or len(parts[0]) not in (4, 6, 8, 10, 12, 14)
+            or not (parts[0].isascii() and parts[0].isdigit())):
+        raise ValueError(f"Bad XMLTV time: {value!r}")
+    digits = parts[0] + "00000101000000"[len(parts[0]):]
+    fields = (int(digits[0:4]), int(digits[4:6]), int(digits[6:8]),
+              int(digits[8:10]), int(digits[10:12]), int(digits[12:14]))
+    year, month, day, hour, minute, second = fields
+    # Only days past the 28th need the length of the month
+    if not (year and 1 <= month <= 12 and 1 <= day and (day <= 28 or day <= calendar.monthrange(year, month)[1])
+            and hour < 24 and minute < 60 and second <= 60):
+        raise ValueError(f"Bad XMLTV time: {value!r}")
+    ts = calendar.timegm(fields + (0, 0, 0))
+    if len(parts) > 1:
+        offset = parts[1]
+        sign = -1 if offset[0] == "-" else 1
+        offset = offset[1:] if offset[0] in "+-" else offset
+        if len(offset) != 4 or not (offset.isascii() and offset.isdigit()):
+            raise ValueError(f"Bad XMLTV time offset: {value!r}")
+        ts -= sign * (int(offset[:2]) * 3600 + int(offset[2:]) * 60)
+    return ts
+
+def format_local_time(ts, fmt="%H:%M", fallback=""):
+    """Format epoch seconds in the local timezone for display."""
+    if ts is None:
+        return fallback
+    return datetime.datetime.fromtimestamp(ts).strftime(fmt)
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+def parse_time_cursor(text, now=None):
+    """
+    Read a time typed on the main screen, in local time. Accepts "20:00" (today),
+    "Fri 20:00" or "Friday 20:00" (the next Friday, today if it is Friday), "tomorrow 20:00",
+    "2024-05-31 20:00", and a range such as "Fri 20:00-23:00" (ending the next day if the end
+    is before the start).
+    Returns (start, stop) as epoch seconds, stop is None for a single time.
+    Raises ValueError if the text is not understood.
+    """
+    match = re.fullmatch(r"\s*(?:(\d{4}-\d{2}-\d{2})|([A-Za-z]+))?\s*(\d{1,2}):(\d{2})\s*(?:-\s*(\d{1,2}):(\d{2}))?\s*", text)
+    if not match:
+        raise ValueError(f"Could not read the time '{text.strip()}'. Try e.g. 20:00, Fri 20:00 or Fri 20:00-23:00.")
+    date_text, day_text, hour, minute, end_hour, end_minute = match.groups()
+    day = (now or datetime.datetime.now()).date()
+    if date_text:
+        day = datetime.date.fromisoformat(date_text)
+    elif day_text and day_text.lower() == "tomorrow":
+        day += datetime.timedelta(days=1)
+    elif day_text and day_text.lower() != "today":
+        # A full day name or its first three letters, nothing in between
+        weekday = next((i for i, name in enumerate(WEEKDAYS) if day_text.lower() in (name, name[:3])), None)
+        if weekday is None:
+            raise ValueError(f"Unknown day '{day_text}'")
+        day += datetime.timedelta(days=(weekday - day.weekday()) % 7)
+    start = datetime.datetime.combine(day, datetime.time(int(hour), int(minute)))
+    if end_hour is None:
+        return int(start.timestamp()), None
+    stop = datetime.datetime.combine(day, datetime.time(int(end_hour), int(end_minute)))
+    if stop <= start:
+        stop += datetime.timedelta(days=1)
+    return int(start.timestamp()), int(stop.timestamp())
+
+def iter_xmltv(source):
+    """
+    Stream the <channel> and <programme> elements of an XMLTV document without building the tree.
+    source is a file path or file object; the live feed is streamed to disk first (see FeedCache).
+    Each element is cleared as soon as the caller asks for the next one, so peak memory depends on
+    what the caller keeps, not on the size of the document.
+    """
+    root = None
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if root is None:
+            root = elem
+        if event == "end" and elem.tag in ("channel", "programme"):
+            yield elem
+            elem.clear()
+            # Drop the finished element from <tv> so the root does not keep growing
+            root.clear()
+
+def tokenize(text):
+    """Lower-case word tokens used by the search index."""
+    return re.findall(r"\w+", text.lower())
+
+class TitleIndex:
+    '''
+    This class is an inverted index over program titles (and sub-titles).
+    Every word maps to the ascending list of program ids (positions in EPGSnapshot.programmes)
+    that contain it, and the words are kept sorted so a query word can match as a prefix with a
+    binary search. A query returns the programs that match every one of its words.
+    '''
+    def __init__(self):
+        self.postings = {}  # word -> program ids
+        self.words = ()
+
+    def add(self, prog_id, text):
+        for word in set(tokenize(text)):
+            self.postings.setdefault(word, []).append(prog_id)
+
+    def freeze(self):
+        """Finish building: called once after all programs have been added."""
+        self.postings = {word: tuple(ids) for word, ids in self.postings.items()}
+        self.words = tuple(sorted(self.postings))
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        i = bisect.bisect_left(self.words, prefix)
+        while i < len(self.words) and self.words[i].startswith(prefix):
+            ids.update(self.postings[self.words[i]])
+            i += 1
+        return ids
+
+    def search(self, query):
+        """Sorted ids of programs where every word of query starts a word of the title."""
+        result = None
+        for word in tokenize(query):
+            ids = self._prefix_ids(word)
+            result = ids if result is None else result & ids
+            if not result:
+                return []
+        return sorted(result) if result else []
+
+class DescriptionStore:
+    '''
+    This class keeps program descriptions out of memory.
+    While the feed is parsed each description is appended to an anonymous temporary file and
+    only its byte offset and length are kept. A description is read back when it is asked for
+    (when the user opens it) and the most recently used ones are kept in a small LRU cache.
+    The temporary file is deleted automatically once the snapshot is no longer used.
+    A store loaded from a SnapshotFile gets its own copy of the text (see read_from), so the
+    snapshot file is never held open and can be replaced by the next save.
+    '''
+    def __init__(self, cache_size=128):
+        self._file = tempfile.TemporaryFile()
+        self._lock = threading.Lock()
+        self.size = 0  # Bytes of description text stored
+        self.offsets = array('q')  # program id -> byte offset, -1 if there is no description
+        self.lengths = array('I')
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.reads = 0
+
+    def append(self, text):
+        """Store the description of the next program id (text may be None)."""
+        if not text:
+            self.offsets.append(-1)
+            self.lengths.append(0)
+            return
+        data = text.encode("utf-8")
+        self.offsets.append(self.size)
+        self.lengths.append(len(data))
+        self._file.write(data)
+        self.size += len(data)
+
+    def finish(self):
+        """Called once all descriptions have been appended."""
+        self._file.flush()
+
+    def write_to(self, f):
+        """Copy all the stored description text to the file object f; the offsets stay valid relative to where it starts."""
+        with self._lock:
+            self._file.seek(0)
+            shutil.copyfileobj(self._file, f)
+
+    def read_from(self, f, size, offsets, lengths):
+        """
+        Fill an empty store with size bytes of description text read from the current position
+        of the file object f (as written by write_to) and the offsets and lengths that go with it.
+        The text is copied in chunks, never held in memory as a whole.
+        """
+        copied = 0
+        while copied < size:
+            chunk = f.read(min(65536, size - copied))
+            if not chunk:
+                raise EOFError("description text is cut short")
+            self._file.write(chunk)
+            copied += len(chunk)
+        self.size = size
+        self.offsets = offsets
+        self.lengths = lengths
+        self.finish()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def texts(self):
+        """Every description in program id order (None where there is none), read without the LRU cache."""
+        for prog_id in range(len(self.offsets)):
+            offset = self.offsets[prog_id]
+            if offset < 0:
+                yield None
+            else:
+                # Only hold the lock for the read: the caller may keep this generator suspended
+                with self._lock:
+                    self._file.seek(offset)
+                    data = self._file.read(self.lengths[prog_id])
+                yield data.decode("utf-8")
+
+    def get(self, prog_id):
+        """Description of a program id, or None. Reads from disk unless it is in the LRU cache."""
+        with self._lock:
+            if prog_id in self._cache:
+                self._cache.move_to_end(prog_id)
+                return self._cache[prog_id]
+            offset = self.offsets[prog_id]
+            if offset < 0:
+                text = None
+            else:
+                self._file.seek(offset)
+                text = self._file.read(self.lengths[prog_id]).decode("utf-8")
+                self.reads += 1
+            self._cache[prog_id] = text
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return text
+
+class Programme:
+    '''
+    This class is one airing of a program in an EPGSnapshot.
+    There can be hundreds of thousands of these, so it uses __slots__ instead of a dict per
+    record and keeps only what the screens use: the ids of the program and its channel, the
+    title, the start and stop times as epoch seconds (None if they could not be parsed) and the
+    genres. Channel ids, titles, genre tuples and timestamps are shared between records by the
+    snapshot, so repeats of a show cost one string and back-to-back programs share a time.
+    '''
+    __slots__ = ('id', 'channel', 'title', 'start_ts', 'stop_ts', 'categories')
+
+    def __init__(self, prog_id, channel, title, start_ts, stop_ts, categories):
+        self.id = prog_id
+        self.channel = channel
+        self.title = title
+        self.start_ts = start_ts
+        self.stop_ts = stop_ts
+        self.categories = categories
+
+    def __repr__(self):
+        return f"Programme({self.id}, {self.channel!r}, {self.title!r}, {self.start_ts}, {self.stop_ts})"
+
+class ParsedFeed:
+    '''
+    This class is one feed parsed on its own: its channels, program records, descriptions and
+    title index, without the per-channel indexes an EPGSnapshot builds. EPGRepository keeps one
+    per feed so the feeds can be merged again when only one of them changes, and building the
+    indexes only for the merged EPGSnapshot keeps that copy small.
+    '''
+    def __init__(self, elements, stamp=None):
+        """
+        elements is an iterable of <channel>/<programme> elements, usually from iter_xmltv.
+        stamp identifies the copy of the feed they came from (see FeedCache.stamp).
+        """
+        channel_map = {}
+        channel_descriptions = {}
+        programmes = []
+        descriptions = DescriptionStore()  # Indexed by program id, kept on disk
+        title_index = TitleIndex()
+        # Pools so equal values read from different elements end up as one shared object
+        genre_tuples = {}
+        timestamps = {}
+        parse_start = time.perf_counter()
+        for elem in elements:
+            if elem.tag == 'channel':
+                channel_id = elem.get('id')
+                display_name = elem.findtext('display-name')
+                if channel_id and display_name:
+                    channel_map[channel_id] = display_name
+                    channel_descriptions[display_name] = elem.findtext('desc') or "No description available."
+                continue
+            channel_id = elem.get('channel')
+            if channel_id:
+                channel_id = sys.intern(channel_id)
+            title = sys.intern(elem.findtext('title') or "")
+            # Convert the timestamps once here so nothing else has to parse them again
+            try:
+                start_ts = parse_xmltv_time(elem.get('start'))
+                stop_ts = parse_xmltv_time(elem.get('stop'))
+                start_ts = timestamps.setdefault(start_ts, start_ts)
+                stop_ts = timestamps.setdefault(stop_ts, stop_ts)
+            except ValueError:
+                start_ts = stop_ts = None
+            genres = tuple(sys.intern(cat.text.strip()) for cat in elem.findall('category') if cat.text)
+            genres = genre_tuples.setdefault(genres, genres)
+            descriptions.append(elem.findtext('desc'))
+            # The id is the program's position in self.programmes, so any view holding a
+            # program record can get back to its other data directly
+            prog = Programme(len(programmes), channel_id, title, start_ts, stop_ts, genres)
+            title_index.add(len(programmes), f"{title} {elem.findtext('sub-title') or ''}")
+            programmes.append(prog)
+        descriptions.finish()
+        title_index.freeze()
+        perf_metrics.record("parse", time.perf_counter() - parse_start, {"programmes": len(programmes)})
+        self.stamp = stamp
+        self.channel_map = channel_map  # channel_id -> display name
+        self.channel_descriptions = channel_descriptions  # display name -> description
+        self.programmes = programmes  # Every programme in feed order, id = position
+        self.descriptions = descriptions
+        self.title_index = title_index
+
+class EPGSnapshot:
+    '''
+    This class is one parsed copy of the feed.
+    It is built completely (usually on the background refresh thread) and never changed
+    afterwards: lists are stored as tuples and dicts as read-only mappings, so the Tk thread
+    can read it while the next copy is being built.
+    '''
+    def __init__(self, version, elements, stamp=None):
+        """
+        elements is an iterable of <channel>/<programme> elements, usually from iter_xmltv.
+        stamp identifies the copy of the feed they came from (see FeedCache.stamp).
+        """
+        feed = ParsedFeed(elements, stamp)
+        self._build(version, stamp, dict(feed.channel_map), dict(feed.channel_descriptions),
+                    feed.programmes, feed.descriptions, feed.title_index)
+
+    @classmethod
+    def from_parts(cls, version, stamp, channel_map, channel_descriptions, programmes, descriptions, title_index):
+        """Make a snapshot from data that has already been parsed (see SnapshotFile.load)."""
+        snapshot = cls.__new__(cls)
+        snapshot._build(version, stamp, channel_map, channel_descriptions, programmes, descriptions, title_index)
+        return snapshot
+
+    @classmethod
+    def merged(cls, version, stamp, parts):
+        """
+        Combine feeds parsed on their own (ParsedFeed) into one snapshot. A channel id belongs
+        to the first part that lists it and programs the other parts have for it are dropped.
+        Programs get new ids in the combined order; a record whose id does not change (all of
+        the first part) is shared with its part instead of copied.
+        """
+        if len(parts) == 1:
+            part = parts[0]
+            return cls.from_parts(version, stamp, dict(part.channel_map), dict(part.channel_descriptions),
+                                  part.programmes, part.descriptions, part.title_index)
+        channel_map = {}
+        channel_descriptions = {}
+        owner = {}  # channel_id -> index of the part it is taken from
+        for n, part in enumerate(parts):
+            for channel_id, display_name in part.channel_map.items():
+                if channel_id not in owner:
+                    owner[channel_id] = n
+                    channel_map[channel_id] = display_name
+                    channel_descriptions[display_name] = part.channel_descriptions[display_name]
+        programmes = []
+        descriptions = DescriptionStore()
+        title_index = TitleIndex()
+        for n, part in enumerate(parts):
+            new_ids = {}
+            for prog, text in zip(part.programmes, part.descriptions.texts()):
+                if owner.get(prog.channel, n) != n:
+                    continue  # An earlier feed has this channel
+                new_ids[prog.id] = len(programmes)
+                if prog.id != len(programmes):
+                    prog = Programme(len(programmes), prog.channel, prog.title,
+                                     prog.start_ts, prog.stop_ts, prog.categories)
+                programmes.append(prog)
+                descriptions.append(text)
+            for word, ids in part.title_index.postings.items():
+                kept = [new_ids[i] for i in ids if i in new_ids]
+                if kept:
+                    title_index.postings.setdefault(word, []).extend(kept)
+        descriptions.finish()
+        title_index.freeze()
+        return cls.from_parts(version, stamp, channel_map, channel_descriptions, programmes, descriptions, title_index)
+
+    def _build(self, version, stamp, channel_map, channel_descriptions, programmes, descriptions, title_index):
+        build_start = time.perf_counter()
+        programs_by_channel = {}
+        genre_postings = {}  # genre -> ascending program ids
+        for prog in programmes:
+            for genre in prog.categories:
+                genre_postings.setdefault(genre, []).append(prog.id)
+            if prog.channel and prog.title and prog.start_ts is not None and prog.stop_ts is not None:
+                programs_by_channel.setdefault(prog.channel, []).append(prog)
+
+        # Sort programs by start time for each channel and keep the start times
+        # alongside so now/next can be found with a binary search. The running maximum of
+        # the stop times (programs can overlap) gives the other end of a time range query.
+        start_index = {}
+        stop_index = {}
+        for channel_id, plist in programs_by_channel.items():
+            plist.sort(key=lambda p: p.start_ts)
+            programs_by_channel[channel_id] = tuple(plist)
+            start_index[channel_id] = tuple(p.start_ts for p in plist)
+            stop_index[channel_id] = tuple(accumulate((p.stop_ts for p in plist), max))
+        perf_metrics.record("index_build", time.perf_counter() - build_start, {"channels": len(programs_by_channel)})
+
+        self.version = version
+        self.stamp = stamp
+        self.channel_map = MappingProxyType(channel_map)  # channel_id -> display name
+        self.sorted_channels = tuple(sorted(channel_map.items(), key=lambda x: x[1]))  # (channel_id, display_name) sorted by display name
+        self.programmes = tuple(programmes)  # Every programme in feed order
+        self.programs_by_channel = MappingProxyType(programs_by_channel)  # channel_id -> programmes sorted by start
+        self.categories = tuple(sorted(genre_postings))  # Sorted unique genres
+        self.genre_postings = MappingProxyType({genre: tuple(ids) for genre, ids in genre_postings.items()})  # genre -> ascending program ids
+        self.channel_descriptions = MappingProxyType(channel_descriptions)  # display name -> description
+        self.descriptions = descriptions  # program id -> description text or None, read on demand
+        self.start_index = MappingProxyType(start_index)  # channel_id -> sorted start_ts values
+        self.stop_index = MappingProxyType(stop_index)  # channel_id -> latest stop_ts so far, in start order
+        self.title_index = title_index
+        # (first start, last stop) of the programs on the grid, None if there are none
+        self.time_range = (min(starts[0] for starts in start_index.values()),
+                           max(stops[-1] for stops in stop_index.values())) if start_index else None
+
+    def genre_ids(self, genres, match_all=False):
+        """
+        Sorted ids of programs in any of the genres (union), or in all of them (intersection)
+        when match_all is True. Works only on the posting lists built at ingest.
+        """
+        postings = [self.genre_postings.get(genre, ()) for genre in genres]
+        if not postings:
+            return []
+        if match_all:
+            # Intersect starting from the shortest list so the working set stays small
+            postings.sort(key=len)
+            result = set(postings[0])
+            for ids in postings[1:]:
+                result.intersection_update(ids)
+                if not result:
+                    break
+        else:
+            result = set()
+            for ids in postings:
+                result.update(ids)
+        return sorted(result)
+
+    def now_and_next(self, channel_id, t, n=6):
+        """
+        Return up to n programmes on a channel: the one airing at epoch time t (if any)
+        followed by the ones after it. Uses a binary search over the channel's start times.
+        If everything has already finished the first n programmes are returned.
+        """
+        programs = self.programs_by_channel.get(channel_id, ())
+        starts = self.start_index.get(channel_id, ())
+        i = bisect.bisect_right(starts, t) - 1
+        if i < 0 or programs[i].stop_ts <= t:
+            # Nothing airing at t, start from the next programme to begin
+            i += 1
+        if i >= len(programs):
+            return programs[:n]
+        return programs[i:i + n]
+
+    def programmes_between(self, channel_id, start, stop):
+        """
+        Programmes on a channel that are on air at some point from epoch time start up to stop,
+        in start order. Two binary searches bound them: the start times for the last one
+        beginning before stop, and the running maximum of the stop times for the first one
+        that can still be on at start.
+        """
+        programs = self.programs_by_channel.get(channel_id, ())
+        lo = bisect.bisect_right(self.stop_index.get(channel_id, ()), start)
+        hi = bisect.bisect_left(self.start_index.get(channel_id, ()), stop)
+        return tuple(p for p in programs[lo:hi] if p.stop_ts > start)
+
+class SnapshotFile:
+    '''
+    This class saves the last parsed EPGSnapshot to disk and loads it back at startup, so the
+    main screen can show the guide straight away instead of waiting for the network.
+    The file is a header followed by flat arrays: one table holding every distinct string, the
+    programs stored one array per field, the title index and the description text. Loading
+    reads each array in one step and copies the description text into the snapshot's own
+    DescriptionStore, so the file is closed straight away and the next save can replace it
+    (Windows does not allow replacing a file that is open or mapped).
+    The header holds a format number (files written in another format are ignored) and the
+    stamp of the cached feed the snapshot was parsed from, so it is only used while it still
+    matches that feed.
+    '''
+    MAGIC = b"TVOSNAP\0"
+    FORMAT = 1
+    HEADER = struct.Struct("<8sIBxxxqq")  # magic, format, big endian flag, feed size, feed mtime
+    SECTION = struct.Struct("<cxxxxxxxq")  # array typecode, length in bytes
+    NO_TIME = -2 ** 63  # Stored for start/stop times that could not be parsed
+
+    def __init__(self, path):
+        self.path = path
+
+    def save(self, snapshot, stamp):
+        """Write snapshot to disk, built from the cached feed with this stamp (see FeedCache.stamp)."""
+        strings = {}  # string -> position in the string table
+
+        def ref(text):
+            return strings.setdefault(text, len(strings))
+
+        channels = array('I')  # (channel id, display name, description) string refs
+        for channel_id, display_name in snapshot.channel_map.items():
+            channels.extend((ref(channel_id), ref(display_name), ref(snapshot.channel_descriptions[display_name])))
+
+        prog_channel = array('i')  # -1 if the programme had no channel
+        prog_title = array('I')
+        prog_start = array('q')
+        prog_stop = array('q')
+        prog_genres = array('I')  # Index of the programme's genre tuple
+        genre_sets = {}
+        genre_offsets = array('I', [0])
+        genre_items = array('I')
+        for prog in snapshot.programmes:
+            prog_channel.append(-1 if prog.channel is None else ref(prog.channel))
+            prog_title.append(ref(prog.title))
+            prog_start.append(self.NO_TIME if prog.start_ts is None else prog.start_ts)
+            prog_stop.append(self.NO_TIME if prog.stop_ts is None else prog.stop_ts)
+            if prog.categories not in genre_sets:
+                genre_sets[prog.categories] = len(genre_sets)
+                genre_items.extend(ref(genre) for genre in prog.categories)
+                genre_offsets.append(len(genre_items))
+            prog_genres.append(genre_sets[prog.categories])
+
+        title_index = snapshot.title_index
+        words = array('I')
+        posting_offsets = array('I', [0])
+        posting_ids = array('I')
+        for word in title_index.words:
+            words.append(ref(word))
+            posting_ids.extend(title_index.postings[word])
+            posting_offsets.append(len(posting_ids))
+
+        string_offsets = array('q', [0])
+        string_data = bytearray()
+        for text in strings:
+            string_data += text.encode("utf-8")
+            string_offsets.append(len(string_data))
+
+        descriptions = snapshot.descriptions
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write to a temporary file first so a failed write never leaves a broken snapshot
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.FORMAT, sys.byteorder == "big", stamp[0], stamp[1]))
+            for data in (string_offsets, string_data, channels, prog_channel, prog_title, prog_start, prog_stop,
+                         prog_genres, genre_offsets, genre_items, words, posting_offsets, posting_ids,
+                         descriptions.offsets, descriptions.lengths):
+                nbytes = len(data) * (data.itemsize if isinstance(data, array) else 1)
+                f.write(self.SECTION.pack(getattr(data, 'typecode', 'B').encode(), nbytes))
+                f.write(data)
+                f.write(b"\0" * (-nbytes % 8))
+            f.write(self.SECTION.pack(b'B', descriptions.size))
+            descriptions.write_to(f)
+        os.replace(tmp_path, self.path)
+
+    def load(self, version, stamp):
+        """
+        Read the saved snapshot and give it this version number.
+        Returns None if there is no usable file: missing, damaged, in another format, or saved
+        for a different copy of the feed than stamp.
+        """
+        if stamp is None:
+            return None
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return None
+        try:
+            with f:
+                magic, file_format, big_endian, size, mtime = self.HEADER.unpack(f.read(self.HEADER.size))
+                if (magic != self.MAGIC or file_format != self.FORMAT or big_endian != (sys.byteorder == "big")
+                        or (size, mtime) != stamp):
+                    return None
+                sections = []
+                for _ in range(15):
+                    typecode, nbytes = self.SECTION.unpack(f.read(self.SECTION.size))
+                    chunk = f.read(nbytes)
+                    if len(chunk) != nbytes:
+                        raise EOFError("file is cut short")
+                    f.seek(-nbytes % 8, os.SEEK_CUR)
+                    if typecode == b'B':
+                        sections.append(chunk)
+                    else:
+                        values = array(typecode.decode())
+                        values.frombytes(chunk)
+                        sections.append(values)
+                (string_offsets, string_data, channels, prog_channel, prog_title, prog_start, prog_stop,
+                 prog_genres, genre_offsets, genre_items, words, posting_offsets, posting_ids,
+                 desc_offsets, desc_lengths) = sections
+                # The description text is the last section; copy it out instead of reading it all
+                typecode, desc_size = self.SECTION.unpack(f.read(self.SECTION.size))
+                descriptions = DescriptionStore()
+                descriptions.read_from(f, desc_size, desc_offsets, desc_lengths)
+
+            strings = [str(string_data[string_offsets[i]:string_offsets[i + 1]], "utf-8")
+                       for i in range(len(string_offsets) - 1)]
+            channel_map = {}
+            channel_descriptions = {}
+            for i in range(0, len(channels), 3):
+                display_name = strings[channels[i + 1]]
+                channel_map[strings[channels[i]]] = display_name
+                channel_descriptions[display_name] = strings[channels[i + 2]]
+            genre_sets = [tuple(strings[j] for j in genre_items[genre_offsets[k]:genre_offsets[k + 1]])
+                          for k in range(len(genre_offsets) - 1)]
+            timestamps = {}
+            for value in prog_start:
+                timestamps.setdefault(value, value)
+            for value in prog_stop:
+                timestamps.setdefault(value, value)
+            timestamps[self.NO_TIME] = None
+            programmes = [
+                Programme(i, None if channel < 0 else strings[channel], strings[title],
+                          timestamps[start], timestamps[stop], genre_sets[genres])
+                for i, (channel, title, start, stop, genres)
+                in enumerate(zip(prog_channel, prog_title, prog_start, prog_stop, prog_genres))
+            ]
+            title_index = TitleIndex()
+            title_index.postings = {strings[word]: posting_ids[posting_offsets[k]:posting_offsets[k + 1]]
+                                    for k, word in enumerate(words)}
+            title_index.freeze()
+        except Exception as e:
+            print(f"Ignoring saved snapshot {self.path}: {e}")
+            return None
+        return EPGSnapshot.from_parts(version, stamp, channel_map, channel_descriptions, programmes, descriptions, title_index)
+
+class SQLiteGuide:
+    '''
+    This class keeps a copy of the parsed guide in an SQLite database. It is the optional
+    backend picked with EPG_BACKEND = "sqlite".
+    Programs keep the ids they have in the EPGSnapshot and are indexed on (channel_id, start)
+    for now/next and time range queries, titles and descriptions go into an FTS5 table for
+    word search and genres into a category table. Each new snapshot is ingested in a single
+    transaction by the refresh worker, and queries run on the Tk thread through their own
+    connection. A query only answers if the database holds the same copy of the feed as the
+    snapshot asking (compared by feed stamp); otherwise it returns None and the caller uses
+    the in-memory indexes.
+    '''
+    SCHEMA = """
+        PRAGMA journal_mode = WAL;
+        CREATE TABLE IF NOT EXISTS meta (feed_size INTEGER, feed_mtime INTEGER);
+        CREATE TABLE IF NOT EXISTS channels (id TEXT PRIMARY KEY, name TEXT NOT NULL, description TEXT);
+        CREATE TABLE IF NOT EXISTS programmes (id INTEGER PRIMARY KEY, channel_id TEXT, title TEXT NOT NULL, start INTEGER, stop INTEGER);
+        CREATE INDEX IF NOT EXISTS programmes_channel_start ON programmes (channel_id, start);
+        CREATE TABLE IF NOT EXISTS categories (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+        CREATE TABLE IF NOT EXISTS programme_categories (
+            category_id INTEGER NOT NULL, programme_id INTEGER NOT NULL,
+            PRIMARY KEY (category_id, programme_id)) WITHOUT ROWID;
+    """
+    # The title column holds words from tokenize(), so FTS must keep each of them whole and as
+    # written: no accent folding, and "_" is part of a word as it is for \w
+    FTS_TABLE = ("CREATE VIRTUAL TABLE programme_text USING fts5(title, description, "
+                 "tokenize=\"unicode61 remove_diacritics 0 tokenchars '_'\")")
+    # Programs that can be shown on the grid (the ones EPGSnapshot.programs_by_channel keeps)
+    LISTED = "title != '' AND start IS NOT NULL AND stop IS NOT NULL"
+
+    def __init__(self, path):
+        self.path = path
+        self.fts = True  # False if this SQLite was built without FTS5
+        self._reader = None
+        self._longest = {}  # feed stamp -> length of the longest program, bounds range queries
+
+    def ingest(self, snapshot):
+        """
+        Replace the stored guide with snapshot in one transaction. Does nothing and returns
+        False if the database already holds that copy of the feed.
+        """
+        if snapshot.stamp is None:
+            return False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        try:
+            conn.executescript(self.SCHEMA)
+            try:
+                row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'programme_text'").fetchone()
+                if row is None or row[0] != self.FTS_TABLE:
+                    # Missing, or made with other tokenizer options: make it again and re-ingest
+                    conn.execute("DROP TABLE IF EXISTS programme_text")
+                    conn.execute(self.FTS_TABLE)
+                    conn.execute("DELETE FROM meta")
+            except sqlite3.OperationalError:
+                self.fts = False
+            if conn.execute("SELECT feed_size, feed_mtime FROM meta").fetchone() == tuple(snapshot.stamp):
+                return False
+            # The title column gets the words of the title index, which include the sub-title
+            words = [[] for _ in snapshot.programmes]
+            for word, ids in snapshot.title_index.postings.items():
+                for prog_id in ids:
+                    words[prog_id].append(word)
+            categories = {genre: i for i, genre in enumerate(snapshot.categories)}
+
+            conn.execute("BEGIN")
+            try:
+                for table in ("meta", "channels", "programmes", "categories", "programme_categories"):
+                    conn.execute(f"DELETE FROM {table}")
+                conn.executemany("INSERT INTO channels VALUES (?, ?, ?)",
+                                 ((channel_id, name, snapshot.channel_descriptions.get(name))
+                                  for channel_id, name in snapshot.channel_map.items()))
+                conn.executemany("INSERT INTO programmes VALUES (?, ?, ?, ?, ?)",
+                                 ((p.id, p.channel, p.title, p.start_ts, p.stop_ts) for p in snapshot.programmes))
+                conn.executemany("INSERT INTO categories VALUES (?, ?)", ((i, genre) for genre, i in categories.items()))
+                conn.executemany("INSERT OR IGNORE INTO programme_categories VALUES (?, ?)",
+                                 ((categories[genre], p.id) for p in snapshot.programmes for genre in p.categories))
+                if self.fts:
+                    conn.execute("DELETE FROM programme_text")
+                    conn.executemany("INSERT INTO programme_text (rowid, title, description) VALUES (?, ?, ?)",
+                                     ((i, " ".join(words[i]), text)
+                                      for i, text in enumerate(snapshot.descriptions.texts())))
+                conn.execute("INSERT INTO meta VALUES (?, ?)", tuple(snapshot.stamp))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return True
+
+    def _read(self, stamp, query):
+        """
+        Run query(connection) in one read transaction and return its result, or None if the
+        database does not hold the copy of the feed with this stamp.
+        """
+        if stamp is None or not os.path.exists(self.path):
+            return None
+        try:
+            if self._reader is None:
+                self._reader = sqlite3.connect(self.path, isolation_level=None)
+            self._reader.execute("BEGIN")
+            try:
+                if self._reader.execute("SELECT feed_size, feed_mtime FROM meta").fetchone() != tuple(stamp):
+                    return None
+                return query(self._reader)
+            finally:
+                self._reader.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"SQLite guide query failed: {e}")
+            return None
+
+    def close(self):
+        """Close the connection queries use; the next query opens it again."""
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def search_titles(self, stamp, query):
+        """Sorted ids of programs where every word of query starts a word of the title (FTS5 prefix query)."""
+        if not self.fts:
+            return None
+        words = tokenize(query)
+        if not words:
+            return []
+        match = "title : (" + " AND ".join(f'"{word}"*' for word in words) + ")"
+        return self._read(stamp, lambda conn: [row[0] for row in conn.execute(
+            "SELECT rowid FROM programme_text WHERE programme_text MATCH ? ORDER BY rowid", (match,))])
+
+    def genre_ids(self, stamp, genres, match_all=False):
+        """Sorted ids of programs in any of the genres, or in all of them when match_all is True."""
+        genres = sorted(set(genres))
+        if not genres:
+            return []
+        sql = ("SELECT pc.programme_id FROM programme_categories pc JOIN categories c ON c.id = pc.category_id"
+               f" WHERE c.name IN ({', '.join('?' * len(genres))}) GROUP BY pc.programme_id")
+        params = genres
+        if match_all:
+            sql += " HAVING COUNT(*) = ?"
+            params = genres + [len(genres)]
+        return self._read(stamp, lambda conn: [row[0] for row in conn.execute(sql + " ORDER BY pc.programme_id", params)])
+
+    def now_and_next_ids(self, stamp, channel_id, t, n=6):
+        """Ids of the programs EPGSnapshot.now_and_next returns, found with the (channel_id, start) index."""
+        def query(conn):
+            # The last program to start at or before t, as the binary search in EPGSnapshot finds it
+            row = conn.execute(
+                f"SELECT id, start, stop FROM programmes WHERE channel_id = ? AND {self.LISTED} AND start <= ?"
+                " ORDER BY start DESC, id DESC LIMIT 1", (channel_id, t)).fetchone()
+            select = f"SELECT id FROM programmes WHERE channel_id = ? AND {self.LISTED}"
+            order = " ORDER BY start, id LIMIT ?"
+            ids = []
+            if row is not None:
+                prog_id, start, stop = row
+                # Start from it if it is still airing at t, otherwise from the one after it
+                after = ">" if stop <= t else ">="
+                ids = [r[0] for r in conn.execute(
+                    select + f" AND (start > ? OR (start = ? AND id {after} ?))" + order,
+                    (channel_id, start, start, prog_id, n))]
+            if not ids:
+                # Nothing started yet, or everything has finished: the first n programs,
+                # as EPGSnapshot.now_and_next does
+                ids = [r[0] for r in conn.execute(select + order, (channel_id, n))]
+            return ids
+        return self._read(stamp, query)
+
+    def programmes_between_ids(self, stamp, channel_id, start, stop):
+        """Ids of the programs EPGSnapshot.programmes_between returns, found with the (channel_id, start) index."""
+        def query(conn):
+            if stamp not in self._longest:
+                self._longest[stamp] = conn.execute(f"SELECT MAX(stop - start) FROM programmes WHERE {self.LISTED}").fetchone()[0] or 0
+            # Nothing longer than the longest program can start before start - longest and still be on
+            return [row[0] for row in conn.execute(
+                f"SELECT id FROM programmes WHERE channel_id = ? AND {self.LISTED}"
+                " AND start >= ? AND start < ? AND stop > ? ORDER BY start, id",
+                (channel_id, start - self._longest[stamp], stop, start))]
+        return self._read(stamp, query)
+
+    def channel_names(self, stamp):
+        """Sorted unique channel display names."""
+        return self._read(stamp, lambda conn: [row[0] for row in conn.execute(
+            "SELECT DISTINCT name FROM channels ORDER BY name")])
+
+class EPGRepository:
+    '''
+    This class owns the EPG data fetched from the XMLTV feeds.
+    The feeds are downloaded and parsed once and every screen queries this object instead of
+    fetching the XML itself. Each feed is fetched and parsed on its own thread (sharing one
+    pooled session) and the results are merged into one snapshot, de-duplicated by channel id. It holds the channels, the programs grouped by channel, the
+    genres (categories) and the channel and program descriptions of the current EPGSnapshot.
+    The version number goes up every time new data has been loaded, so screens
+    can tell whether data they built earlier is out of date.
+    Every newly parsed snapshot is also saved with a SnapshotFile, and load_saved installs it
+    again on the next start without touching the network.
+    With the "sqlite" backend each snapshot is also ingested into an SQLiteGuide and the
+    search, genre, now/next and channel queries are answered from it.
+    fetch_snapshots is safe to call from a worker thread; install must be called on the Tk thread.
+    '''
+    def __init__(self, urls=None, backend=EPG_BACKEND):
+        self.urls = list(urls or load_feed_urls())
+        self.session = None  # Shared by the feeds, made by the first fetch
+        self.feed_caches = [FeedCache(url) for url in self.urls]
+        cache_dir = self.feed_caches[0].cache_dir
+        self.snapshot_file = SnapshotFile(os.path.join(cache_dir, "guide.snap"))
+        self.guide_db = SQLiteGuide(os.path.join(cache_dir, "guide.db")) if backend == "sqlite" else None
+        self.version = 0
+        self.error = None
+        self.snapshot = None
+        self.channel_map = {}
+        self.sorted_channels = ()
+        self.programmes = ()
+        self.programs_by_channel = {}
+        self.categories = ()
+        self.channel_descriptions = {}
+        self._fetch_lock = threading.Lock()
+        self._last_version = 0
+        self._latest = None  # Newest snapshot made by fetch_snapshots or load_saved
+        self._parts = {}  # url -> ParsedFeed of that feed alone
+
+    def fetch_snapshots(self):
+        """
+        Revalidate every feed at once and yield a new merged EPGSnapshot each time one of them
+        brings new data, so a slow feed never holds back the others. The one exception is a
+        feed that has not been parsed yet and is still fetching: its cached copy is only parsed
+        once its own fetch has reported, so merging waits for it.
+        Yields nothing when no feed changed and a snapshot is already loaded. If nothing is
+        loaded yet, feeds that are unchanged or unreachable are parsed from their cached copy.
+        Only the last snapshot is saved. Raises if no feed has any data. Does not touch the
+        installed data.
+        """
+        with self._fetch_lock:
+            if self.session is None:
+                self.session = make_session(len(self.feed_caches))
+                for cache in self.feed_caches:
+                    cache.session = self.session
+            results = queue.Queue()
+            for cache in self.feed_caches:
+                threading.Thread(target=self._fetch_feed, args=(cache, results),
+                                 name=f"EPGFeed {cache.url}", daemon=True).start()
+            errors = []
+            reported = set()  # urls of the feeds whose fetch has finished
+            changed = False  # a feed brought data that is not in a yielded snapshot yet
+            snapshot = None
+            for _ in self.feed_caches:
+                cache, part, error = results.get()
+                reported.add(cache.url)
+                if error is not None:
+                    print(f"Error fetching or parsing {cache.url}: {error}")
+                    errors.append(error)
+                elif part is not None:
+                    self._parts[cache.url] = part
+                    changed = True
+                # _merge would parse the cached copy of such a feed while its thread may be
+                # replacing that file with a new download
+                if changed and not any(c.url not in reported and c.url not in self._parts and c.has_copy()
+                                       for c in self.feed_caches):
+                    changed = False
+                    snapshot = self._merge()
+                    if snapshot is not None:
+                        yield snapshot
+            if snapshot is not None:
+                self._save(snapshot)
+                return
+            if self._last_version:
+                # The database may still be missing this copy, e.g. on the first run with sqlite
+                self._update_guide_db(self._latest)
+                return
+            snapshot = self._merge()
+            if snapshot is None:
+                raise errors[0] if errors else RuntimeError("No EPG feed could be loaded")
+            self._save(snapshot)
+            yield snapshot
+
+    def _fetch_feed(self, cache, results):
+        """Feed thread: revalidate one feed and parse it if a new copy came, then report on results."""
+        try:
+            part = None
+            if cache.fetch():
+                stamp = cache.stamp()
+                part = ParsedFeed(iter_xmltv(cache.path), stamp)
+            results.put((cache, part, None))
+        except Exception as e:
+            results.put((cache, None, e))
+
+    def _merge(self):
+        """
+        Merge the latest parse of every feed into a new snapshot, parsing the cached copy of any
+        feed that has not been parsed yet. None if no feed has any data.
+        No feed may be fetching, except ones that already have a parse.
+        """
+        parts = []
+        for cache in self.feed_caches:
+            part = self._parts.get(cache.url)
+            if part is None and cache.has_copy():
+                try:
+                    stamp = cache.stamp()
+                    part = self._parts[cache.url] = ParsedFeed(iter_xmltv(cache.path), stamp)
+                except Exception as e:
+                    print(f"Error parsing cached copy of {cache.url}: {e}")
+            if part is not None:
+                parts.append((cache.url, part))
+        if not parts:
+            return None
+        stamp = self._merged_stamp((url, part.stamp) for url, part in parts)
+        snapshot = EPGSnapshot.merged(self._last_version + 1, stamp, [part for url, part in parts])
+        self._last_version = snapshot.version
+        self._latest = snapshot
+        return snapshot
+
+    def _save(self, snapshot):
+        """Save a merged snapshot for the next start (see load_saved) and ingest it into the SQLite guide."""
+        try:
+            self.snapshot_file.save(snapshot, snapshot.stamp)
+        except Exception as e:
+            print(f"Error saving snapshot: {e}")
+        self._update_guide_db(snapshot)
+
+    def _merged_stamp(self, feed_stamps):
+        """
+        One (size, digest) stamp for a merged snapshot from the (url, stamp) of each feed in it,
+        in the same form as FeedCache.stamp so SnapshotFile and SQLiteGuide can check it.
+        """
+        feed_stamps = list(feed_stamps)
+        digest = hashlib.sha1(repr(feed_stamps).encode("utf-8")).digest()
+        return (sum(stamp[0] for url, stamp in feed_stamps), int.from_bytes(digest[:8], "big", signed=True))
+
+    def _update_guide_db(self, snapshot):
+        if self.guide_db is None or snapshot is None:
+            return
+        try:
+            self.guide_db.ingest(snapshot)
+        except Exception as e:
+            print(f"Error updating SQLite guide: {e}")
+
+    def _update_installed_guide_db(self):
+        """
+        Ingest the installed snapshot if the database does not hold it yet, e.g. one restored by
+        load_saved (which runs on the Tk thread and leaves that to the callers that may block).
+        """
+        if self.guide_db is not None:
+            with self._fetch_lock:
+                self._update_guide_db(self.snapshot)
+
+    def load_saved(self):
+        """
+        Install the snapshot saved by an earlier run, if nothing is loaded yet and it was built
+        from the feed copy that is in the cache now. Reads only the local file, so it is quick
+        enough for the Tk thread, and returns straight away if a fetch is running on another
+        thread. The SQLite guide is not updated here; load, load_cached and the refresh worker
+        do that. Returns True if it was installed.
+        """
+        if not self._fetch_lock.acquire(blocking=False):
+            return False
+        try:
+            if self._last_version:
+                return False
+            caches = [cache for cache in self.feed_caches if cache.has_copy()]
+            if not caches:
+                return False
+            stamp = self._merged_stamp((cache.url, cache.stamp()) for cache in caches)
+            snapshot = self.snapshot_file.load(self._last_version + 1, stamp)
+            if snapshot is None:
+                return False
+            self._last_version = snapshot.version
+            self._latest = snapshot
+        finally:
+            self._fetch_lock.release()
+        return self.install(snapshot)
+
+    def available(self):
+        """
+        Install the newest finished data without waiting: the latest snapshot made by a fetch on
+        another thread, or else the one saved by the last run. Never touches the network, so
+        screens on the Tk thread call this instead of load. Returns True if data is loaded.
+        """
+        self._install_latest()
+        return bool(self.version or self.load_saved())
+
+    def _install_latest(self):
+        latest = self._latest
+        if latest is not None and latest.version > self.version:
+            self.install(latest)
+
+    def install(self, snapshot):
+        """Make a finished snapshot the current data. Older snapshots are ignored."""
+        if snapshot is None or snapshot.version <= self.version:
+            return False
+        self.snapshot = snapshot
+        self.channel_map = snapshot.channel_map
+        self.sorted_channels = snapshot.sorted_channels
+        self.programmes = snapshot.programmes
+        self.programs_by_channel = snapshot.programs_by_channel
+        self.categories = snapshot.categories
+        self.channel_descriptions = snapshot.channel_descriptions
+        self.version = snapshot.version
+        self.error = None
+        return True
+
+    def load(self, force=False):
+        """
+        Fetch and parse the feeds on the calling thread. If data is already loaded it is reused
+        unless force is True. A forced load revalidates the cached feeds and only re-parses the
+        ones the server sent a new copy of. Without force the snapshot saved by the last run is
+        used if there is one.
+        Blocks while another thread is fetching. Not for the Tk thread, which uses available.
+        Returns True if data is available, False if the fetch failed and nothing is loaded.
+        """
+        if self.available() and not force:
+            self._update_installed_guide_db()
+            return True
+        try:
+            for snapshot in self.fetch_snapshots():
+                self.install(snapshot)
+            self.error = None
+        except Exception as e:
+            print(f"Error fetching or parsing XML: {e}")
+            self.error = e
+        # A fetch on another thread may have made a snapshot while this one waited for it
+        self._install_latest()
+        return self.version > 0
+
+    def load_cached(self):
+        """
+        Load without touching the network: the saved snapshot if it still matches the cached
+        feeds, otherwise the cached copies of the feeds are parsed. Feeds are never revalidated.
+        Returns True if data is available, False if no feed has a cached copy.
+        """
+        if self.available():
+            self._update_installed_guide_db()
+            return True
+        try:
+            with self._fetch_lock:
+                snapshot = self._merge()
+                if snapshot is not None:
+                    self._save(snapshot)
+            if snapshot is None:
+                raise RuntimeError("No EPG feed has a cached copy")
+            self.install(snapshot)
+        except Exception as e:
+            print(f"Error parsing cached XML: {e}")
+            self.error = e
+        return self.version > 0
+
+    def programme_description(self, programme, snapshot=None):
+        """
+        Description of a program record taken from search results, filters or the grid.
+        Found directly by the record's id in snapshot, the EPGSnapshot the record came from (the
+        "snapshot" of a search or filter result), or else the current one. None if there is none
+        or the record is not from that snapshot.
+        """
+        snapshot = snapshot or self.snapshot
+        if snapshot is None:
+            return None
+        prog_id = programme.id
+        if prog_id >= len(snapshot.programmes) or snapshot.programmes[prog_id] is not programme:
+            return None
+        return snapshot.descriptions.get(prog_id)
+
+    def programmes_with_genres(self, genres, match_all=False):
+        """Programs in any of the genres (OR), or in every one of them when match_all (AND), in feed order."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return []
+        ids = self.guide_db.genre_ids(snapshot.stamp, genres, match_all) if self.guide_db else None
+        if ids is None:
+            ids = snapshot.genre_ids(genres, match_all)
+        return [snapshot.programmes[i] for i in ids]
+
+    def search_titles(self, query):
+        """Programs whose title words start with every word of query, in feed order."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return []
+        ids = self.guide_db.search_titles(snapshot.stamp, query) if self.guide_db else None
+        if ids is None:
+            ids = snapshot.title_index.search(query)
+        return [snapshot.programmes[i] for i in ids]
+
+    def _result(self, programme, snapshot):
+        return {
+            "channel": self.channel_name(programme.channel),
+            "title": programme.title,
+            "genres": ", ".join(programme.categories),
+            # Converted to local time for display
+            "start": format_local_time(programme.start_ts, "%Y-%m-%d %H:%M", "?"),
+            "stop": format_local_time(programme.stop_ts, "%H:%M", "?"),
+            "programme": programme,
+            # A result list can outlive a refresh, so keep what its description is looked up in
+            "snapshot": snapshot
+        }
+
+    def search(self, term):
+        """
+        Search results for term (see search_titles) as dicts with the channel name, title,
+        genres, local start and stop time, the program record and the snapshot it is from, in
+        feed order.
+        """
+        with perf_metrics.timed("search") as counters:
+            snapshot = self.snapshot
+            results = [self._result(programme, snapshot) for programme in self.search_titles(term)]
+            counters["results"] = len(results)
+        return results
+
+    def filter_by_genres(self, genres, match_all=False):
+        """Programs in the genres (see programmes_with_genres) as result dicts like search."""
+        with perf_metrics.timed("filter") as counters:
+            snapshot = self.snapshot
+            results = [self._result(programme, snapshot) for programme in self.programmes_with_genres(genres, match_all)]
+            counters["results"] = len(results)
+        return results
+
+    def now_and_next(self, channel_id, t, n=6):
+        """Current and upcoming programmes on a channel at epoch time t (see EPGSnapshot.now_and_next)."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return ()
+        ids = self.guide_db.now_and_next_ids(snapshot.stamp, channel_id, t, n) if self.guide_db else None
+        if ids is None:
+            return snapshot.now_and_next(channel_id, t, n)
+        return tuple(snapshot.programmes[i] for i in ids)
+
+    def programmes_between(self, channel_id, start, stop):
+        """Programmes on a channel on air at some point between epoch times start and stop (see EPGSnapshot.programmes_between)."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return ()
+        ids = self.guide_db.programmes_between_ids(snapshot.stamp, channel_id, start, stop) if self.guide_db else None
+        if ids is None:
+            return snapshot.programmes_between(channel_id, start, stop)
+        return tuple(snapshot.programmes[i] for i in ids)
+
+    def time_range(self):
+        """(first start, last stop) of the loaded programmes as epoch seconds, or None."""
+        return self.snapshot.time_range if self.snapshot else None
+
+    def cache_stats(self):
+        """Hit/miss counters of the feed caches added together, to see how much bandwidth revalidation saves."""
+        totals = {}
+        for cache in self.feed_caches:
+            for key, value in cache.stats().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def channel_name(self, channel_id):
+        return self.channel_map.get(channel_id, channel_id)
+
+    def channel_names(self):
+        """Sorted unique channel display names."""
+        names = self.guide_db.channel_names(self.snapshot.stamp) if self.guide_db and self.snapshot else None
+        if names is None:
+            names = sorted(set(self.channel_map.values()))
+        return names
+
+    def channel_id_for_name(self, display_name):
+        for channel_id, name in self.sorted_channels:
+            if name == display_name:
+                return channel_id
+        return None
+
+class EPGRefreshWorker:
+    '''
+    This class refreshes the EPG repository on a background thread.
+    The thread does the network requests and the XML parsing, then puts each finished
+    EPGSnapshot (nothing if no feed had changed, or the error) on a queue. The Tk thread polls
+    the queue with after() and installs the snapshots, so the UI never waits on the network.
+    '''
+    def __init__(self, repository, interval=60):
+        self.repository = repository
+        self.interval = interval
+        self.results = queue.Queue()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._seen_version = 0  # Repository version when poll last returned
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="EPGRefreshWorker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def request_refresh(self):
+        """Ask the worker to refresh now instead of waiting for the next interval."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                for snapshot in self.repository.fetch_snapshots():
+                    self.results.put(("snapshot", snapshot))
+            except Exception as e:
+                self.results.put(("error", e))
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def poll(self):
+        """
+        Called on the Tk thread. Installs any finished snapshots and returns True if the
+        repository holds newer data than at the last poll (a screen may have installed it
+        already with EPGRepository.available).
+        """
+        while True:
+            try:
+                kind, payload = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "error":
+                print(f"Error fetching or parsing XML: {payload}")
+                self.repository.error = payload
+            else:
+                self.repository.install(payload)
+        changed = self.repository.version > self._seen_version
+        self._seen_version = self.repository.version
+        return changed
+
+class BookmarkStore:
+    '''
+    This class holds the bookmarked channel display names and keeps them in a JSON file in
+    APP_DIR, so bookmarks survive a restart. The file is rewritten on every change.
+    '''
+    def __init__(self, path=None):
+        self.path = path or os.path.join(APP_DIR, "bookmarks.json")
+        self.names = set()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.names = set(name for name in json.load(f) if isinstance(name, str))
+        except Exception:
+            self.names = set()
+
+    def set(self, display_name, bookmarked):
+        """Bookmark or un-bookmark a channel. Returns True if that changed anything."""
+        if (display_name in self.names) == bookmarked:
+            return False
+        if bookmarked:
+            self.names.add(display_name)
+        else:
+            self.names.discard(display_name)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(sorted(self.names), f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving bookmarks: {e}")
+        return True
+
+# The repository and the bookmarks shared by every screen in the process. They read APP_DIR
+# when they are made, so they are only made on first use, not when the module is imported.
+_shared = {}
+_shared_lock = threading.Lock()
+
+def get_epg_repository():
+    """Return the shared EPGRepository, making it on the first call."""
+    return _get_shared("epg_repository", EPGRepository)
+
+def get_bookmark_store():
+    """Return the shared BookmarkStore, making it on the first call."""
+    return _get_shared("bookmark_store", BookmarkStore)
+
+def _get_shared(name, factory):
+    with _shared_lock:
+        if name not in _shared:
+            _shared[name] = factory()
+        return _shared[name]
+
+def __getattr__(name):
+    # epg_engine.epg_repository and "from epg_engine import bookmark_store" still work
+    if name == "epg_repository":
+        return get_epg_repository()
+    if name == "bookmark_store":
+        return get_bookmark_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class ChannelOrder:
+    '''
+    This class is the order of the channel rows on the main screen: bookmarked channels first,
+    then the others, each group in the name order of the channel list it is given.
+    Only the positions of the bookmarked channels are stored, as a sorted list, so the row of
+    a channel and the channel on a row are both found with a binary search, and a bookmark
+    toggle inserts or removes one entry instead of re-sorting every channel.
+    '''
+    def __init__(self, channels, bookmarked_names):
+        self.channels = channels  # (channel_id, display_name) sorted by display name
+        self.positions = {}  # display name -> positions in channels
+        for i, (channel_id, display_name) in enumerate(channels):
+            self.positions.setdefault(display_name, []).append(i)
+        self.bookmarked = sorted(i for name in bookmarked_names for i in self.positions.get(name, ()))
+
+    def __len__(self):
+        return len(self.channels)
+
+    def row_of(self, position):
+        """Display row of the channel at this position in channels."""
+        k = bisect.bisect_left(self.bookmarked, position)
+        if k < len(self.bookmarked) and self.bookmarked[k] == position:
+            return k
+        return len(self.bookmarked) + position - k
+
+    def at_row(self, row):
+        """(channel_id, display_name, is_bookmarked) of the channel shown on a display row."""
+        if row < len(self.bookmarked):
+            return self.channels[self.bookmarked[row]] + (True,)
+        # The n-th channel that is not bookmarked: the first k with bookmarked[k] - k > n
+        # tells how many bookmarked positions come before it
+        n = row - len(self.bookmarked)
+        lo, hi = 0, len(self.bookmarked)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.bookmarked[mid] - mid <= n:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self.channels[n + lo] + (False,)
+
+    def set_bookmarked(self, display_name, bookmarked):
+        """
+        Move the channel(s) with this display name into or out of the bookmarked group.
+        Returns the range of display rows whose channel changed, or None if nothing moved.
+        """
+        changed = None
+        for position in self.positions.get(display_name, ()):
+            old_row = self.row_of(position)
+            k = bisect.bisect_left(self.bookmarked, position)
+            is_bookmarked = k < len(self.bookmarked) and self.bookmarked[k] == position
+            if is_bookmarked == bookmarked:
+                continue
+            if bookmarked:
+                self.bookmarked.insert(k, position)
+            else:
+                del self.bookmarked[k]
+            new_row = self.row_of(position)
+            # Every row between the old and the new place shifts by one
+            low, high = min(old_row, new_row), max(old_row, new_row) + 1
+            changed = range(low, high) if changed is None else range(min(changed.start, low), max(changed.stop, high))
+        return changed
+
+# Columns written by the export command line, in order
+EXPORT_FIELDS = ["channel_id", "channel", "position", "title", "start", "stop", "start_ts", "stop_ts", "categories", "description"]
+
+def iter_now_next_rows(repository, t, n=6, channel_ids=None, descriptions=False):
+    """
+    Export rows for the programme on at epoch time t and the ones after it (up to n) on every
+    channel, the same programmes the main screen shows. One channel is looked up at a time.
+    """
+    for channel_id in channel_ids or [channel_id for channel_id, name in repository.sorted_channels]:
+        for position, programme in enumerate(repository.now_and_next(channel_id, t, n)):
+            yield _export_row(repository, programme, position, descriptions)
+
+def iter_schedule_rows(repository, start=None, stop=None, channel_ids=None, descriptions=False):
+    """
+    Export rows for every programme of every channel in start order, or only the ones on air
+    between epoch times start and stop (to the end of the guide if stop is None).
+    """
+    for channel_id in channel_ids or [channel_id for channel_id, name in repository.sorted_channels]:
+        if start is None:
+            programmes = repository.programs_by_channel.get(channel_id, ())
+        else:
+            programmes = repository.programmes_between(channel_id, start, stop if stop is not None else 2 ** 62)
+        for position, programme in enumerate(programmes):
+            yield _export_row(repository, programme, position, descriptions)
+
+def _export_row(repository, programme, position, descriptions):
+    return {
+        "channel_id": programme.channel,
+        "channel": repository.channel_name(programme.channel),
+        "position": position,
+        "title": programme.title,
+        "start": _iso_local(programme.start_ts),
+        "stop": _iso_local(programme.stop_ts),
+        "start_ts": programme.start_ts,
+        "stop_ts": programme.stop_ts,
+        "categories": list(programme.categories),
+        "description": repository.programme_description(programme) if descriptions else None
+    }
+
+def _iso_local(ts):
+    return datetime.datetime.fromtimestamp(ts).astimezone().isoformat() if ts is not None else None
+
+def write_rows(rows, fmt, out):
+    """
+    Write export rows to the text file out as they come, one JSON object per line ("jsonl") or
+    as CSV with a header ("csv", categories joined by "; "). Returns the number of rows written.
+    """
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            row["categories"] = "; ".join(row["categories"])
+            writer.writerow(["" if row[field] is None else row[field] for field in EXPORT_FIELDS])
+            count += 1
+    else:
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+def main(argv=None):
+    """
+    Command line export: load the guide once and stream now/next for every channel or the
+    full schedules to stdout, for signage and other systems that cannot read the Tk window.
+    """
+    parser = argparse.ArgumentParser(description="Export the TV guide as JSON Lines or CSV.")
+    parser.add_argument("mode", choices=["now-next", "schedule"],
+                        help="now-next: the programme on now and the ones after it on every channel; "
+                             "schedule: every programme of every channel")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--at", help="local time or range instead of now, as on the main screen "
+                                     "(e.g. 20:00, Fri 20:00, Fri 20:00-23:00); limits a schedule to a range")
+    parser.add_argument("-n", "--count", type=int, default=6, help="programmes per channel for now-next (default 6)")
+    parser.add_argument("--channel", action="append", help="only this channel (display name or id), can be repeated")
+    parser.add_argument("--descriptions", action="store_true", help="include programme descriptions")
+    parser.add_argument("--offline", action="store_true", help="use the cached feeds only, without any network access")
+    args = parser.parse_args(argv)
+
+    start = stop = None
+    if args.at:
+        try:
+            start, stop = parse_time_cursor(args.at)
+        except ValueError as e:
+            parser.error(str(e))
+
+    repository = get_epg_repository()
+    # A cron job should get the current feed: revalidate it (a 304 costs almost nothing).
+    # Progress and error messages go to stderr so they never end up in the export.
+    with redirect_stdout(sys.stderr):
+        loaded = repository.load_cached() if args.offline else repository.load(force=True)
+    if not loaded:
+        print(f"Failed to load the EPG: {repository.error}", file=sys.stderr)
+        return 1
+    channel_ids = None
+    if args.channel:
+        channel_ids = []
+        for name in args.channel:
+            channel_id = name if name in repository.channel_map else repository.channel_id_for_name(name)
+            if channel_id is None:
+                parser.error(f"unknown channel {name!r}")
+            channel_ids.append(channel_id)
+
+    if args.mode == "now-next":
+        rows = iter_now_next_rows(repository, start if start is not None else int(time.time()),
+                                  args.count, channel_ids, args.descriptions)
+    else:
+        rows = iter_schedule_rows(repository, start, stop, channel_ids, args.descriptions)
+    try:
+        count = write_rows(rows, args.format, sys.stdout)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader stopped early (e.g. piped into head); that is not an error. Point stdout
+        # at devnull so the flush at exit does not fail again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    print(f"Exported {count} programmes", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#Importing neccesary Libraries
+import argparse
+import datetime
+import random
+import sys
+from xml.sax.saxutils import escape, quoteattr
+
+'''
+This script writes a made-up XMLTV feed in the same shape as the xmltv.net one, so the guide can
+be tried and benchmarked without the network. The feed only depends on its settings: the same
+channels, days, programmes per day, seed and start date always give byte for byte the same file.
+'''
+CATEGORIES = ["News", "Sport", "Drama", "Comedy", "Documentary", "Movie", "Children's", "Reality",
+              "Lifestyle", "Entertainment", "Music", "Cooking", "Travel", "Science", "Crime"]
+WORDS = ["morning", "evening", "late", "live", "world", "city", "house", "garden", "kitchen", "river",
+         "mountain", "island", "police", "doctor", "rescue", "market", "secret", "great", "little",
+         "wild", "ocean", "street", "family", "country", "night", "summer", "winter", "golden", "lost",
+         "hidden", "bush", "coast", "race", "cup", "final", "story", "show", "report", "files",
+         "journey", "kings", "queens", "time", "planet", "road", "station", "school", "farm", "club"]
+# Shortest programme length; programme boundaries fall on multiples of this
+SLOT_MINUTES = 5
+
+def programme_lengths(rnd, per_day):
+    """Split one day into per_day programme lengths (in minutes) that add up to 24 hours."""
+    slots = 24 * 60 // SLOT_MINUTES
+    if not 1 <= per_day <= slots:
+        raise ValueError(f"programmes per day must be between 1 and {slots}")
+    cuts = sorted(rnd.sample(range(1, slots), per_day - 1)) + [slots]
+    lengths = []
+    previous = 0
+    for cut in cuts:
+        lengths.append((cut - previous) * SLOT_MINUTES)
+        previous = cut
+    return lengths
+
+def sentence(rnd, words):
+    text = " ".join(rnd.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+def write_feed(out, channels=20, days=2, per_day=24, seed=1, start=None, desc_sentences=3):
+    """
+    Write a synthetic XMLTV document to the text file object out.
+    Every channel gets per_day back to back programmes a day for days days from start (a
+    timezone aware datetime, midnight 1 January 2024 +10:00 by default). Programmes have a
+    title (and sometimes a sub-title), one to three categories and a description of
+    desc_sentences sentences. Returns the number of programmes written.
+    """
+    rnd = random.Random(seed)
+    if start is None:
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=10)))
+    # A fixed pool of series titles so searches find the same show on many channels and days
+    titles = sorted({" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 3))).title()
+                     for _ in range(max(50, channels * per_day // 4))})
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    out.write('<tv generator-info-name="make_synthetic_feed">\n')
+    for c in range(channels):
+        out.write(f'  <channel id="synthetic{c}.au">\n'
+                  f'    <display-name>{escape(f"Channel {c + 1:03d}")}</display-name>\n'
+                  f'    <desc>{escape(sentence(rnd, 8))}</desc>\n'
+                  f'  </channel>\n')
+    count = 0
+    for c in range(channels):
+        t = start
+        for day in range(days):
+            for length in programme_lengths(rnd, per_day):
+                stop = t + datetime.timedelta(minutes=length)
+                title = rnd.choice(titles)
+                out.write(f'  <programme start="{t:%Y%m%d%H%M%S %z}" stop="{stop:%Y%m%d%H%M%S %z}" '
+                          f'channel={quoteattr(f"synthetic{c}.au")}>\n'
+                          f'    <title>{escape(title)}</title>\n')
+                if rnd.random() < 0.3:
+                    out.write(f'    <sub-title>{escape(sentence(rnd, 3)[:-1])}</sub-title>\n')
+                desc = " ".join(sentence(rnd, rnd.randint(6, 14)) for _ in range(desc_sentences))
+                out.write(f'    <desc>{escape(desc)}</desc>\n')
+                for category in rnd.sample(CATEGORIES, rnd.randint(1, 3)):
+                    out.write(f'    <category lang="en">{escape(category)}</category>\n')
+                out.write('  </programme>\n')
+                t = stop
+                count += 1
+    out.write('</tv>\n')
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic XMLTV feed.")
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--per-day", type=int, default=24, help="programmes per channel per day")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--start", default="2024-01-01T00:00:00+10:00",
+                        help="ISO date and time of the first programme, with its UTC offset")
+    parser.add_argument("--desc-sentences", type=int, default=3, help="sentences in each description")
+    parser.add_argument("-o", "--output", default="-", help="file to write (default: stdout)")
+    args = parser.parse_args(argv)
+    start = datetime.datetime.fromisoformat(args.start)
+    if start.tzinfo is None:
+        parser.error("--start needs a UTC offset, e.g. 2024-01-01T00:00:00+10:00")
+    settings = dict(channels=args.channels, days=args.days, per_day=args.per_day, seed=args.seed,
+                    start=start, desc_sentences=args.desc_sentences)
+    if args.output == "-":
+        count = write_feed(sys.stdout, **settings)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            count = write_feed(f, **settings)
+    print(f"Wrote {count} programmes on {args.channels} channels", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()